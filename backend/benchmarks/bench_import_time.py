@@ -0,0 +1,83 @@
+"""Cold-start import cost of the app, from `python -X importtime`.
+
+Imports the module (server by default) in fresh interpreters, then reports the
+median total import time, the peak RSS and the most expensive imports by
+cumulative time. It also flags any heavy LLM SDK that got imported eagerly.
+Those SDKs should only load through the provider registry in
+modules/llm_router.py. No database is needed.
+
+    cd backend && python -m benchmarks.bench_import_time [--module server] [--runs 5] [--top 15]
+
+Exits non-zero when a --forbid module is imported at startup (defaults to the
+LLM SDKs), so the check can guard cold start in CI.
+"""
+import argparse
+import os
+import resource
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Imported lazily by the LLM providers; none of them should appear at startup
+HEAVY_SDKS = ("openai", "langchain_google_genai", "langchain_core", "google.generativeai", "tiktoken")
+
+
+def parse_importtime(stderr):
+    """(module, self_us, cumulative_us) for each line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_once(module):
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "benchmark")
+    env.setdefault("TRACING_EXPORTER", "none")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    # Largest child so far; every run imports the same thing, so that is this run's peak
+    return parse_importtime(result.stderr), resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--forbid", nargs="*", default=list(HEAVY_SDKS), help="modules that must not load at startup")
+    args = parser.parse_args()
+
+    runs = [import_once(args.module) for _ in range(args.runs)]
+    totals = [next(cumulative for name, _, cumulative in rows if name == args.module) for rows, _ in runs]
+    rows, max_rss_kb = runs[-1]
+
+    print(f"import {args.module}: median {statistics.median(totals) / 1000:.0f} ms "
+          f"(min {min(totals) / 1000:.0f}, max {max(totals) / 1000:.0f}) over {args.runs} runs, "
+          f"peak RSS {max_rss_kb / 1024:.0f} MB")
+    print(f"\nTop {args.top} imports by cumulative time (last run):")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {self_us / 1000:7.1f} ms self  {name}")
+
+    imported = {name for name, _, _ in rows}
+    eager = [module for module in args.forbid if module in imported]
+    if eager:
+        print(f"\nImported at startup but should load lazily: {', '.join(eager)}")
+        sys.exit(1)
+    print(f"\nNone of {', '.join(args.forbid)} imported at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Serialization, compression and read-path throughput for /api/workouts and /api/mind-soul/meditation-content.
+
+Compares FastAPI's default path (response_model re-validation + jsonable_encoder +
+stdlib json) with the orjson/TypeAdapter paths the app now uses. No database is
+needed; workouts are synthetic documents shaped like the seeded ones.
+
+    cd backend && python -m benchmarks.bench_serialization [--workouts 200] [--seconds 1]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import server  # noqa: E402
+from config.settings import SEED_DATA_DIR  # noqa: E402
+from modules.compression import PrecompressedPayload  # noqa: E402
+from modules.migrations import load_seed  # noqa: E402
+from modules.serialization import FastJSONResponse, model_response  # noqa: E402
+
+
+def sample_workouts(count):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"Workout {i}",
+            "description": "Intense upper body workout targeting chest, back, and arms",
+            "muscle_groups": ["chest", "back", "arms"],
+            "equipment": ["dumbbells", "bench"],
+            "duration": 45,
+            "difficulty": "intermediate",
+            "video_url": f"https://www.youtube.com/watch?v=sample{i}",
+            "instructions": ["Warm up for 5 minutes", "3 sets of push-ups", "3 sets of rows", "Cool down"],
+        }
+        for i in range(count)
+    ]
+
+
+def bench(name, func, seconds):
+    func()  # warm up caches and compiled serializers
+    calls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        func()
+        calls += 1
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<48} {calls / elapsed:>10,.0f} ops/s  {elapsed / calls * 1e6:>9,.1f} us/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workouts", type=int, default=200, help="documents in the /api/workouts payload")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time per measurement")
+    args = parser.parse_args()
+
+    docs = sample_workouts(args.workouts)
+    models = [server.WorkoutPlan(**doc) for doc in docs]
+    adapter = TypeAdapter(List[server.WorkoutPlan])
+
+    print(f"/api/workouts ({args.workouts} documents, models already built)")
+    # What FastAPI does with response_model: dump, re-validate, dump again, then stdlib json
+    bench("default: re-validate + jsonable_encoder + json", lambda: JSONResponse(
+        jsonable_encoder(adapter.dump_python(adapter.validate_python([m.model_dump() for m in models]), mode="json"))
+    ).body, args.seconds)
+    bench("orjson response class, re-validated", lambda: FastJSONResponse(
+        adapter.dump_python(adapter.validate_python([m.model_dump() for m in models]), mode="json")
+    ).body, args.seconds)
+    bench("model_response (TypeAdapter.dump_json)", lambda: model_response(List[server.WorkoutPlan], models).body, args.seconds)
+
+    print(f"/api/workouts read path ({args.workouts} Mongo documents to response body)")
+    bench("Model(**doc) + re-validate + jsonable_encoder", lambda: JSONResponse(jsonable_encoder(
+        adapter.dump_python(adapter.validate_python([server.WorkoutPlan(**doc).model_dump() for doc in docs]), mode="json")
+    )).body, args.seconds)
+    bench("bulk TypeAdapter validation + dump_json", lambda: model_response(
+        List[server.WorkoutPlan], adapter.validate_python(docs)
+    ).body, args.seconds)
+    bench("model_construct + dump_json (trusted)", lambda: model_response(
+        List[server.WorkoutPlan], [server.WorkoutPlan.model_construct(**doc) for doc in docs]
+    ).body, args.seconds)
+
+    items = load_seed(Path(SEED_DATA_DIR) / "meditation_content.json")
+    meditation = {"status": "success", "content": items, "total_count": len(items)}
+    payload = PrecompressedPayload(FastJSONResponse(meditation).body, brotli_quality=5, gzip_level=6)
+    print("/api/mind-soul/meditation-content")
+    bench("default: jsonable_encoder + json", lambda: JSONResponse(jsonable_encoder(meditation)).body, args.seconds)
+    bench("json_response (orjson)", lambda: FastJSONResponse(meditation).body, args.seconds)
+    bench("orjson + gzip per request", lambda: gzip.compress(FastJSONResponse(meditation).body, 6), args.seconds)
+    bench("precompressed payload (gzip)", lambda: payload.response("gzip").body, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
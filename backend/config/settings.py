@@ -6,4 +6,105 @@ ROOT_DIR = Path(__file__).parent.parent
 load_dotenv(ROOT_DIR / '.env')
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-CHROME_PATH = '/usr/bin/google-chrome'  # Linux Chrome path
\ No newline at end of file
+CHROME_PATH = '/usr/bin/google-chrome'  # Linux Chrome path
+
+# Personalized wellness generation
+WELLNESS_PREFERRED_PROVIDER = os.getenv("WELLNESS_PREFERRED_PROVIDER", "openai")  # used until latency data says otherwise
+WELLNESS_MAX_COMPLETION_TOKENS = int(os.getenv("WELLNESS_MAX_COMPLETION_TOKENS", "900"))
+WELLNESS_TOKEN_BUDGET = int(os.getenv("WELLNESS_TOKEN_BUDGET", "6000"))  # prompt + completion, per request
+WELLNESS_GENERATION_MODE = os.getenv("WELLNESS_GENERATION_MODE", "fanout")  # "fanout" (one call per category) or "single"
+WELLNESS_SINGLE_CALL_RETRIES = int(os.getenv("WELLNESS_SINGLE_CALL_RETRIES", "1"))  # re-requests for categories that fail validation
+WELLNESS_CACHE_TTL_SECONDS = int(os.getenv("WELLNESS_CACHE_TTL_SECONDS", str(24 * 3600)))  # served as fresh
+WELLNESS_CACHE_MAX_STALE_SECONDS = int(os.getenv("WELLNESS_CACHE_MAX_STALE_SECONDS", str(7 * 24 * 3600)))  # served while revalidating
+WELLNESS_JOB_CONCURRENCY = int(os.getenv("WELLNESS_JOB_CONCURRENCY", "4"))  # background generation workers
+WELLNESS_JOB_QUEUE_SIZE = int(os.getenv("WELLNESS_JOB_QUEUE_SIZE", "100"))  # queued jobs, across all workers
+WELLNESS_JOB_CLAIM_INTERVAL_SECONDS = float(os.getenv("WELLNESS_JOB_CLAIM_INTERVAL_SECONDS", "5"))  # idle workers re-check Mongo
+WELLNESS_JOB_LEASE_SECONDS = int(os.getenv("WELLNESS_JOB_LEASE_SECONDS", "300"))  # a running job is reclaimed after this
+WELLNESS_JOB_MAX_ATTEMPTS = int(os.getenv("WELLNESS_JOB_MAX_ATTEMPTS", "2"))  # claims before a job is failed
+WELLNESS_JOB_TTL_SECONDS = int(os.getenv("WELLNESS_JOB_TTL_SECONDS", str(24 * 3600)))
+WELLNESS_JOB_POLL_INTERVAL_SECONDS = float(os.getenv("WELLNESS_JOB_POLL_INTERVAL_SECONDS", "1"))
+WELLNESS_JOB_STREAM_TIMEOUT_SECONDS = int(os.getenv("WELLNESS_JOB_STREAM_TIMEOUT_SECONDS", "120"))
+
+# LLM providers and resilience
+LLM_PROVIDERS = [p.strip() for p in os.getenv("LLM_PROVIDERS", "openai,gemini").split(",") if p.strip()]
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "4"))  # min wait before a duplicate goes to the next provider (else the category's p95); 0 disables
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+# Import provider SDKs in the background after startup. Off by default: the import holds the GIL
+# (slowing requests right after boot) and adds tens of MB per worker; off, the first LLM call pays it
+LLM_PRELOAD_SDKS = os.getenv("LLM_PRELOAD_SDKS", "false").lower() == "true"
+CIRCUIT_BREAKER_WINDOW_SIZE = int(os.getenv("CIRCUIT_BREAKER_WINDOW_SIZE", "50"))  # recent calls per provider/model
+CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "10"))  # before the breaker may trip
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+CIRCUIT_BREAKER_LATENCY_THRESHOLD_SECONDS = float(os.getenv("CIRCUIT_BREAKER_LATENCY_THRESHOLD_SECONDS", "12"))  # p95
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))  # before a half-open probe
+
+# Admission control for LLM-backed endpoints
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))  # max wait for a slot
+GROCERY_PREFERRED_PROVIDER = os.getenv("GROCERY_PREFERRED_PROVIDER", "gemini")
+GROCERY_MAX_CONCURRENT = int(os.getenv("GROCERY_MAX_CONCURRENT", "8"))
+GROCERY_MAX_QUEUE = int(os.getenv("GROCERY_MAX_QUEUE", "16"))
+WELLNESS_MAX_CONCURRENT = int(os.getenv("WELLNESS_MAX_CONCURRENT", "4"))
+WELLNESS_MAX_QUEUE = int(os.getenv("WELLNESS_MAX_QUEUE", "8"))
+
+# Rate limiting for expensive endpoints (token bucket per client IP)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (per worker) or "mongo" (shared)
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "20"))  # burst size in tokens
+RATE_LIMIT_REFILL_PER_SECOND = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", str(20 / 60)))
+RATE_LIMIT_TRUST_FORWARDED_FOR = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() == "true"  # only behind a proxy that appends to it
+RATE_LIMIT_TRUSTED_PROXY_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_PROXY_HOPS", "1"))  # proxies in front of the app; the client is that many entries from the right
+# Tokens charged per call; wellness generation fans out to four LLM calls
+RATE_LIMIT_ROUTE_COSTS = {
+    "grocery_recommendations": 1,
+    "wellness_recommendations": 4,
+}
+
+# Idempotency-Key support for POST endpoints
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))  # how long responses are replayed
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "300"))  # in-progress claim; covers slow LLM calls
+IDEMPOTENCY_EXCLUDED_PREFIXES = ("/api/auth/",)  # never store credentials or tokens
+
+# Tracing
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file")  # "file" (OTLP/JSON lines), "otlp_http" (collector) or "none"
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "/tmp/nutracia/traces.jsonl")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))  # fraction of new traces recorded
+
+# On-demand sampling profiler
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")  # X-Profile-Token value that profiles a request and reads profiles
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))  # fraction of requests profiled without the header
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.005"))
+PROFILER_DIR = os.getenv("PROFILER_DIR", "/tmp/nutracia/profiles")
+PROFILER_MAX_PROFILES = int(os.getenv("PROFILER_MAX_PROFILES", "200"))  # oldest are deleted beyond this
+
+# Event loop blocking detector
+LOOP_BLOCK_THRESHOLD_SECONDS = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.25"))  # stalls longer than this are reported
+LOOP_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("LOOP_HEARTBEAT_INTERVAL_SECONDS", "0.1"))
+
+# Slow query log
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_EXPLAIN_AFTER = int(os.getenv("SLOW_QUERY_EXPLAIN_AFTER", "3"))  # slow repeats before a shape's plan is captured; 0 disables
+SLOW_QUERY_MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", "500"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # X-Admin-Token for the /api/system diagnostics; unset disables them
+
+# Logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))  # fraction of INFO records kept; warnings and errors always are
+
+# Response compression
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes; smaller bodies are sent as-is
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))  # per-request; precompressed payloads use 11
+CATALOG_PAYLOAD_TTL_SECONDS = int(os.getenv("CATALOG_PAYLOAD_TTL_SECONDS", "300"))  # precompressed catalog lists are rebuilt after this
+
+# Meditation content library
+MEDITATION_CACHE_TTL_SECONDS = int(os.getenv("MEDITATION_CACHE_TTL_SECONDS", "300"))  # per distinct query and page
+MEDITATION_CACHE_SIZE = int(os.getenv("MEDITATION_CACHE_SIZE", "256"))  # cached query pages per worker
+MEDITATION_MAX_PAGE_SIZE = int(os.getenv("MEDITATION_MAX_PAGE_SIZE", "50"))
+MEDITATION_MAX_PAGE = int(os.getenv("MEDITATION_MAX_PAGE", "100"))  # deepest page served; bounds skip()
+
+# Data migrations (python -m migrations)
+SEED_DATA_DIR = os.getenv("SEED_DATA_DIR", str(ROOT_DIR / "data"))  # catalog and meditation seed files
@@ -0,0 +1,37 @@
+"""Versioned data migrations, applied by `python -m migrations` (run from backend/).
+
+Each migration runs once per database and is recorded in schema_migrations.
+Append new ones with the next version; never edit or renumber applied ones.
+"""
+from pathlib import Path
+
+from config.settings import SEED_DATA_DIR
+from modules.meditation_library import to_document
+from modules.migrations import Migration, drop_duplicates, load_seed, upsert_by_key
+
+# Collection -> natural key of the catalogs seeded from data/<collection>.json
+CATALOG_KEYS = {
+    "workouts": "title",
+    "skincare": "title",
+    "meals": "title",
+    "health_conditions": "condition",
+}
+
+
+async def seed_catalogs(db):
+    # Workers used to seed concurrently on an empty database and could insert everything twice
+    for name, key in CATALOG_KEYS.items():
+        await drop_duplicates(db[name], key)
+        await db[name].create_index(key, unique=True)
+        await upsert_by_key(db[name], load_seed(Path(SEED_DATA_DIR) / f"{name}.json"), key)
+
+
+async def seed_meditation_content(db):
+    items = load_seed(Path(SEED_DATA_DIR) / "meditation_content.json")
+    await upsert_by_key(db.meditation_content, [to_document(item) for item in items], "id")
+
+
+MIGRATIONS = [
+    Migration(1, "seed_catalogs", seed_catalogs),
+    Migration(2, "seed_meditation_content", seed_meditation_content),
+]
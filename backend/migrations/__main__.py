@@ -0,0 +1,60 @@
+"""Apply or inspect data migrations.
+
+    cd backend && python -m migrations status
+    cd backend && python -m migrations up [--target VERSION] [--wait SECONDS]
+
+Uses MONGO_URL and DB_NAME from the environment or backend/.env, like the app.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+load_dotenv(ROOT_DIR / '.env')
+sys.path.insert(0, str(ROOT_DIR))
+
+from migrations import MIGRATIONS  # noqa: E402
+from modules.migrations import MigrationLockedError, MigrationRunner  # noqa: E402
+
+
+async def run(args):
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    runner = MigrationRunner(client[os.environ['DB_NAME']], MIGRATIONS, lock_seconds=args.lock_seconds)
+    try:
+        if args.command == "status":
+            applied = await runner.applied()
+            for migration in runner.migrations:
+                record = applied.get(migration.version)
+                state = f"applied {record['applied_at']:%Y-%m-%d %H:%M:%S}" if record else "pending"
+                print(f"{migration.version:4d}  {migration.name:<32} {state}")
+            return 0
+        try:
+            versions = await runner.migrate(target=args.target, wait_seconds=args.wait)
+        except MigrationLockedError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Applied {len(versions)} migration(s){': ' + ', '.join(map(str, versions)) if versions else ''}")
+        return 0
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m migrations")
+    parser.add_argument("command", choices=["status", "up"])
+    parser.add_argument("--target", type=int, help="apply migrations up to and including this version")
+    parser.add_argument("--wait", type=float, default=60, help="seconds to wait for another run's lock")
+    parser.add_argument("--lock-seconds", type=int, default=600, help="lease on the lock; a crashed run frees it after this")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
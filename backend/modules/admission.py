@@ -0,0 +1,89 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed instead of admitted"""
+
+
+class AdmissionLimiter:
+    """Caps concurrent work for one endpoint, with a short bounded wait queue.
+
+    Requests beyond `max_concurrent` wait up to `queue_timeout_seconds` for a
+    slot; once `max_queue` requests are already waiting, or the wait times out,
+    the request is shed with OverloadedError so the caller can degrade.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout_seconds):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.admitted = 0
+        self.shed = 0
+
+    async def _acquire(self):
+        if not self._slots.locked() and not self.queue_depth:
+            await self._slots.acquire()
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.shed += 1
+            raise OverloadedError(f"{self.name}: queue full")
+
+        self.queue_depth += 1
+        acquired = False
+        try:
+            # Acquire in this task: wait_for's wrapper task could be granted the slot as it is cancelled
+            async with asyncio.timeout(self.queue_timeout_seconds):
+                await self._slots.acquire()
+                acquired = True
+        except BaseException as e:
+            if acquired:
+                self._slots.release()
+            if isinstance(e, TimeoutError):
+                self.shed += 1
+                raise OverloadedError(f"{self.name}: timed out waiting for a slot") from None
+            raise
+        finally:
+            self.queue_depth -= 1
+
+    @asynccontextmanager
+    async def admit(self):
+        await self._acquire()
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+_limiters = {}
+
+
+def get_limiter(name, max_concurrent, max_queue, queue_timeout_seconds):
+    """Shared limiter per endpoint name; limits apply when it is first created"""
+    if name not in _limiters:
+        _limiters[name] = AdmissionLimiter(name, max_concurrent, max_queue, queue_timeout_seconds)
+    return _limiters[name]
+
+
+def all_limiters():
+    return list(_limiters.values())
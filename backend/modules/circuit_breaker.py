@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one upstream provider/model.
+
+    The circuit opens when the failure rate or the p95 latency of the last
+    `window_size` calls crosses its threshold. While open, calls fail fast with
+    CircuitOpenError; after `open_seconds` a limited number of probe calls are
+    let through (half-open) and the first result decides whether it closes again.
+    """
+
+    def __init__(self, name, window_size=50, min_calls=10, failure_rate_threshold=0.5,
+                 latency_threshold_seconds=10.0, open_seconds=30.0, half_open_max_calls=1):
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.latency_threshold_seconds = latency_threshold_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.half_open_calls = 0
+        self.short_circuited = 0
+        self._calls = deque(maxlen=window_size)  # (succeeded, latency_seconds)
+
+    def _transition(self, state):
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._calls.clear()
+        self.half_open_calls = 0
+
+    def allow(self):
+        """Whether a call may go upstream right now"""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self.half_open_calls < self.half_open_max_calls:
+            self.half_open_calls += 1
+            return True
+
+        self.short_circuited += 1
+        return False
+
+    def record(self, succeeded, latency_seconds):
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED if succeeded else OPEN)
+            if succeeded:
+                self._calls.append((succeeded, latency_seconds))
+            return
+
+        self._calls.append((succeeded, latency_seconds))
+        if self.state == CLOSED and len(self._calls) >= self.min_calls:
+            if self.failure_rate() >= self.failure_rate_threshold or self.percentile(95) >= self.latency_threshold_seconds:
+                self._transition(OPEN)
+
+    def failure_rate(self):
+        if not self._calls:
+            return 0.0
+        return sum(1 for succeeded, _ in self._calls if not succeeded) / len(self._calls)
+
+    def percentile(self, p):
+        """Latency percentile (seconds) over the rolling window"""
+        if not self._calls:
+            return 0.0
+        latencies = sorted(latency for _, latency in self._calls)
+        index = min(len(latencies) - 1, max(0, int(round(p / 100 * len(latencies))) - 1))
+        return latencies[index]
+
+    async def call(self, func, *args, timeout=None, **kwargs):
+        """Await func(*args, **kwargs) through the breaker, failing fast when open"""
+        if not self.allow():
+            raise CircuitOpenError(f"circuit {self.name} is open")
+
+        started = time.perf_counter()
+        try:
+            if timeout is None:
+                result = await func(*args, **kwargs)
+            else:
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+        except asyncio.CancelledError:
+            # The caller gave up (e.g. a hedged request lost the race): not the upstream's fault
+            if self.state == HALF_OPEN:
+                self.half_open_calls = max(self.half_open_calls - 1, 0)
+            raise
+        except Exception:
+            self.record(False, time.perf_counter() - started)
+            raise
+        self.record(True, time.perf_counter() - started)
+        return result
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "state": self.state,
+            "calls_in_window": len(self._calls),
+            "failure_rate": round(self.failure_rate(), 3),
+            "p50_latency_seconds": round(self.percentile(50), 3),
+            "p95_latency_seconds": round(self.percentile(95), 3),
+            "p99_latency_seconds": round(self.percentile(99), 3),
+            "short_circuited": self.short_circuited,
+        }
+
+
+_breakers = {}
+
+
+def get_breaker(provider, model, **options):
+    """Shared breaker per (provider, model); options apply when it is first created"""
+    key = (provider, model)
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker(f"{provider}:{model}", **options)
+    return _breakers[key]
+
+
+def all_breakers():
+    return list(_breakers.values())
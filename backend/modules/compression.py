@@ -0,0 +1,262 @@
+import gzip
+import hashlib
+import zlib
+
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: responses are gzip-only without it
+    brotli = None
+
+# Never compressed: gzip/brotli buffer internally, which would hold back server-sent events
+STREAMING_TYPES = ("text/event-stream",)
+
+# Content types worth compressing; images, archives and the like already are
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def accepted_encodings(header):
+    """Encodings from an Accept-Encoding header, minus those refused with q=0"""
+    encodings = set()
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name)
+    return encodings
+
+
+def choose_encoding(header, available):
+    """Best encoding the client accepts out of `available`, brotli first"""
+    accepted = accepted_encodings(header)
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def is_compressible(content_type, compressible_types=DEFAULT_COMPRESSIBLE_TYPES):
+    content_type = (content_type or "").lower()
+    if content_type.startswith(STREAMING_TYPES):
+        return False
+    return any(content_type.startswith(prefix) for prefix in compressible_types)
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header matches `etag` (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class PrecompressedPayload:
+    """Immutable response body compressed once (by default at maximum effort) when it is built.
+
+    Serving it only picks the variant the client accepts, so static payloads
+    cost no compression (or serialization) per request. The compression
+    middleware leaves responses that already carry Content-Encoding alone.
+    The ETag is a hash of the uncompressed body, so it is the same for every
+    encoding and every worker.
+    """
+
+    __slots__ = ("body", "media_type", "etag", "variants")
+
+    def __init__(self, body: bytes, media_type="application/json", gzip_level=9, brotli_quality=11):
+        self.body = body
+        self.media_type = media_type
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.variants = {"gzip": gzip.compress(body, compresslevel=gzip_level)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=brotli_quality)
+        # Tiny bodies can grow when compressed
+        self.variants = {name: data for name, data in self.variants.items() if len(data) < len(body)}
+
+    def response(self, accept_encoding=None, if_none_match=None, status_code=200, headers=None) -> Response:
+        response_headers = {"ETag": self.etag, "Vary": "Accept-Encoding"}
+        if headers:
+            response_headers.update(headers)
+        if etag_matches(if_none_match, self.etag):
+            return Response(status_code=304, headers=response_headers)
+        encoding = choose_encoding(accept_encoding, self.variants)
+        if encoding is not None:
+            response_headers["Content-Encoding"] = encoding
+        return Response(
+            content=self.variants[encoding] if encoding is not None else self.body,
+            status_code=status_code,
+            headers=response_headers,
+            media_type=self.media_type,
+        )
+
+
+class _Compressor:
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data, finish):
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if finish else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing responses with brotli or gzip.
+
+    Only bodies of an allowlisted content type are compressed. Responses with a
+    Content-Length must be at least `minimum_size` bytes; streamed responses
+    (no Content-Length) are compressed chunk by chunk, each chunk flushed as it
+    arrives, and are never held back. Server-sent events and responses that
+    already have a Content-Encoding pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size=1024, compressible_types=DEFAULT_COMPRESSIBLE_TYPES,
+                 gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressible_types = tuple(compressible_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding, self.encodings)
+
+        start_message = None
+        headers = None
+        pending = []
+        pending_size = 0
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, headers, pending_size, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = _Headers(message["headers"])
+                declared = headers.get("content-length")
+                if (
+                    headers.get("content-encoding")
+                    or not is_compressible(headers.get("content-type"), self.compressible_types)
+                    or (declared is not None and declared.isdigit() and int(declared) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is not None:
+                await send({
+                    "type": "http.response.body",
+                    "body": compressor.compress(body, finish=not more_body),
+                    "more_body": more_body,
+                })
+                return
+
+            # A body with a declared length is complete in memory already (@app.middleware
+            # re-streams it in pieces), so collect it and compress it in one go. A real
+            # stream has no length and is compressed as it goes.
+            if headers.get("content-length") is not None:
+                pending.append(body)
+                pending_size += len(body)
+                if more_body:
+                    return
+                body = b"".join(pending)
+                pending.clear()
+                if pending_size < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+            headers.add_vary("Accept-Encoding")
+            if encoding is None:
+                passthrough = True
+                start_message["headers"] = headers.raw
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+            body = compressor.compress(body, finish=not more_body)
+            headers.set("content-encoding", encoding)
+            if more_body:
+                headers.remove("content-length")
+            else:
+                headers.set("content-length", str(len(body)))
+            start_message["headers"] = headers.raw
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class _Headers:
+    """Minimal editor for raw ASGI header lists"""
+
+    def __init__(self, raw):
+        self.raw = list(raw)
+
+    def get(self, name):
+        key = name.encode("latin-1")
+        for header, value in self.raw:
+            if header.lower() == key:
+                return value.decode("latin-1")
+        return None
+
+    def remove(self, name):
+        key = name.encode("latin-1")
+        self.raw = [(header, value) for header, value in self.raw if header.lower() != key]
+
+    def set(self, name, value):
+        self.remove(name)
+        self.raw.append((name.encode("latin-1"), value.encode("latin-1")))
+
+    def add_vary(self, value):
+        current = self.get("vary")
+        if current is None:
+            self.set("vary", value)
+        elif value.lower() not in current.lower():
+            self.set("vary", f"{current}, {value}")
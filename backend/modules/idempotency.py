@@ -0,0 +1,66 @@
+import hashlib
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# Response headers worth replaying; content-length is recomputed
+REPLAYED_HEADERS = ("content-type", "location", "retry-after")
+
+
+def hash_body(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class IdempotencyStore:
+    """First response per Idempotency-Key, kept in a TTL collection for replay.
+
+    begin() claims a key with a short lease; complete() stores the response and
+    extends it to `ttl_seconds`; release() drops the claim so a failed request
+    can be retried. A lease left behind by a crashed worker expires on its own.
+    """
+
+    def __init__(self, collection, ttl_seconds, lease_seconds):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+
+    async def begin(self, key, body_hash):
+        """Claim `key`; returns None when claimed, else the existing record"""
+        now = datetime.utcnow()
+        for _ in range(2):
+            try:
+                await self.collection.insert_one({
+                    "_id": key,
+                    "body_hash": body_hash,
+                    "status": IN_PROGRESS,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.lease_seconds),
+                })
+                return None
+            except DuplicateKeyError:
+                record = await self.collection.find_one({"_id": key})
+                if record is None:
+                    continue
+                if record["expires_at"] > now:
+                    return record
+                # Expired but not yet reaped by the TTL monitor
+                await self.collection.delete_one({"_id": key, "expires_at": record["expires_at"]})
+        return await self.collection.find_one({"_id": key})
+
+    async def complete(self, key, status_code, headers, body):
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "status": COMPLETED,
+                "status_code": status_code,
+                "headers": {name: value for name, value in headers.items() if name.lower() in REPLAYED_HEADERS},
+                "body": body,
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+            }}
+        )
+
+    async def release(self, key):
+        await self.collection.delete_one({"_id": key, "status": IN_PROGRESS})
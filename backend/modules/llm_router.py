@@ -0,0 +1,312 @@
+import abc
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from modules.circuit_breaker import OPEN, CircuitOpenError
+from modules.tracing import start_span
+
+
+@dataclass
+class LLMResult:
+    text: str
+    provider: str
+    model: str
+    latency_seconds: float
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+
+# Provider name -> class; see register_provider and create_provider
+PROVIDERS = {}
+
+
+def register_provider(cls):
+    PROVIDERS[cls.name] = cls
+    return cls
+
+
+def create_provider(name, model, api_key, **options):
+    return PROVIDERS[name](model, api_key, **options)
+
+
+class LLMProvider(abc.ABC):
+    """One chat model behind a common complete(messages) interface.
+
+    Provider SDKs are heavy to import (openai alone is ~0.3s and tens of MB), so
+    subclasses import them in load() rather than at module level. load() blocks;
+    complete() runs it in a thread the first time. Preloading it in the background
+    after startup is opt-in (LLM_PRELOAD_SDKS).
+    """
+
+    name = None
+    loaded = False
+    _load_lock = threading.Lock()  # shared; loads are rare and must not run twice
+
+    def __init__(self, model, api_key):
+        self.model = model
+        self.api_key = api_key
+
+    def load(self):
+        with self._load_lock:
+            if not self.loaded:
+                self._load()
+                self.loaded = True
+
+    def _load(self):
+        pass
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await asyncio.to_thread(self.load)
+
+    @abc.abstractmethod
+    async def complete(self, messages, max_tokens=None, temperature=0.7):
+        ...
+
+
+@register_provider
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, model, api_key, timeout=None):
+        super().__init__(model, api_key)
+        self.timeout = timeout
+        self._client = None
+
+    def _load(self):
+        import openai
+        self._client = openai.AsyncOpenAI(api_key=self.api_key, timeout=self.timeout)
+
+    async def complete(self, messages, max_tokens=None, temperature=0.7):
+        await self.ensure_loaded()
+
+        started = time.perf_counter()
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        usage = response.usage
+        return LLMResult(
+            text=response.choices[0].message.content,
+            provider=self.name,
+            model=self.model,
+            latency_seconds=time.perf_counter() - started,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+        )
+
+
+@register_provider
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    _ROLES = {"system": "system", "user": "human", "assistant": "ai"}
+
+    def __init__(self, model, api_key):
+        super().__init__(model, api_key)
+        self._chat_model = None
+        self._clients = {}
+
+    def _load(self):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        self._chat_model = ChatGoogleGenerativeAI
+
+    def _client(self, max_tokens, temperature):
+        key = (max_tokens, temperature)
+        if key not in self._clients:
+            self._clients[key] = self._chat_model(
+                model=self.model,
+                api_key=self.api_key,
+                max_output_tokens=max_tokens,
+                temperature=temperature,
+            )
+        return self._clients[key]
+
+    async def complete(self, messages, max_tokens=None, temperature=0.7):
+        await self.ensure_loaded()
+
+        started = time.perf_counter()
+        response = await self._client(max_tokens, temperature).ainvoke(
+            [(self._ROLES[m["role"]], m["content"]) for m in messages]
+        )
+        usage = getattr(response, "usage_metadata", None) or {}
+        return LLMResult(
+            text=response.content,
+            provider=self.name,
+            model=self.model,
+            latency_seconds=time.perf_counter() - started,
+            prompt_tokens=usage.get("input_tokens"),
+            completion_tokens=usage.get("output_tokens"),
+        )
+
+
+class LLMRouter:
+    """Routes each prompt to the provider with the best recent p95 latency for its category.
+
+    Health comes from each provider's circuit breaker. Latency is tracked per
+    (provider, category), since a short grocery prompt says little about a long
+    wellness generation; `preferred` goes first until every healthy provider has
+    `min_latency_samples` successful calls in that category.
+
+    When `hedge_after_seconds` is set and the first provider hasn't answered
+    within its own p95 for the category (but at least `hedge_after_seconds`),
+    the same prompt is sent to the next provider and whichever answers first
+    wins; the slower call is cancelled. Only the slowest ~5% of calls are
+    duplicated that way, and none until the category has latency data.
+    Failures fall through to the remaining providers.
+    """
+
+    def __init__(self, providers, breaker_for, hedge_after_seconds=None, timeout=None, observer=None,
+                 latency_window=50, min_latency_samples=5):
+        self.providers = {provider.name: provider for provider in providers}
+        self.breaker_for = breaker_for
+        self.hedge_after_seconds = hedge_after_seconds
+        self.timeout = timeout
+        # observer(provider, category, outcome, latency_seconds, result) is told about every attempt
+        self.observer = observer
+        self.latency_window = latency_window
+        self.min_latency_samples = min_latency_samples
+        self._latencies = {}  # (provider name, category) -> recent successful latencies
+
+    def record_latency(self, provider, category, latency_seconds):
+        key = (provider.name, category)
+        if key not in self._latencies:
+            self._latencies[key] = deque(maxlen=self.latency_window)
+        self._latencies[key].append(latency_seconds)
+
+    def latency_percentile(self, provider, category, p):
+        """Latency percentile (seconds) of `provider` in `category`; None until there are enough samples"""
+        latencies = self._latencies.get((provider.name, category))
+        if not latencies or len(latencies) < self.min_latency_samples:
+            return None
+        return _percentile(latencies, p)
+
+    def rank(self, preferred=None, category=None):
+        """Providers ordered by health, then p95 latency in `category`; `preferred` wins ties and cold starts"""
+        providers = list(self.providers.values())
+        p95 = {provider.name: self.latency_percentile(provider, category, 95) for provider in providers}
+        is_open = {provider.name: self.breaker_for(provider).state == OPEN for provider in providers}
+        compare_latency = all(p95[provider.name] is not None for provider in providers if not is_open[provider.name])
+
+        def sort_key(provider):
+            latency = p95[provider.name]
+            return (
+                is_open[provider.name],
+                not compare_latency and provider.name != preferred,
+                latency is None,
+                latency or 0,
+                provider.name != preferred,
+            )
+        return sorted(providers, key=sort_key)
+
+    def hedge_delay(self, provider, category):
+        """Seconds to wait on `provider` before hedging; None to not hedge"""
+        if not self.hedge_after_seconds:
+            return None
+        p95 = self.latency_percentile(provider, category, 95)
+        return None if p95 is None else max(p95, self.hedge_after_seconds)
+
+    def snapshot(self):
+        return [
+            {
+                "provider": name,
+                "category": category,
+                "samples": len(latencies),
+                "p95_latency_seconds": round(_percentile(latencies, 95), 3),
+            }
+            for (name, category), latencies in self._latencies.items()
+        ]
+
+    async def _attempt(self, provider, messages, max_tokens, temperature, category):
+        started = time.perf_counter()
+        outcome, result = "error", None
+        try:
+            with start_span(
+                "llm.complete",
+                **{"llm.provider": provider.name, "llm.model": provider.model, "llm.category": category or "",
+                   "llm.max_tokens": max_tokens}
+            ) as span:
+                result = await self.breaker_for(provider).call(
+                    provider.complete, messages, max_tokens=max_tokens, temperature=temperature, timeout=self.timeout
+                )
+                span.set_attribute("llm.prompt_tokens", result.prompt_tokens)
+                span.set_attribute("llm.completion_tokens", result.completion_tokens)
+            outcome = "success"
+            self.record_latency(provider, category, time.perf_counter() - started)
+            return result
+        except CircuitOpenError:
+            outcome = "short_circuited"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            if self.observer is not None:
+                self.observer(provider, category, outcome, time.perf_counter() - started, result)
+
+    async def complete(self, messages, max_tokens=None, temperature=0.7, preferred=None, hedge=True, category=None,
+                       on_hedge=None):
+        """Complete `messages` on the best provider.
+
+        on_hedge(), if given, is called before a hedged duplicate is sent, so the
+        caller can pay for it (e.g. from a token budget); returning False skips it.
+        """
+        candidates = self.rank(preferred, category)
+        if not candidates:
+            raise CircuitOpenError("no LLM providers configured")
+        hedge_after = self.hedge_delay(candidates[0], category) if hedge else None
+
+        pending = {}
+        errors = []
+
+        def launch():
+            provider = candidates.pop(0)
+            task = asyncio.create_task(self._attempt(provider, messages, max_tokens, temperature, category))
+            pending[task] = provider
+
+        launch()
+        try:
+            while pending:
+                wait_for_hedge = hedge_after is not None and candidates and len(pending) == 1
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=hedge_after if wait_for_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Primary is slower than its p95: hedge with the next provider, once
+                    hedge_after = None
+                    if on_hedge is None or on_hedge():
+                        launch()
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+
+                if not pending and candidates:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # Surface CircuitOpenError only if every provider was short-circuited
+        for error in errors:
+            if not isinstance(error, CircuitOpenError):
+                raise error
+        raise errors[-1]
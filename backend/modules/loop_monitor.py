@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Detects callbacks that block the event loop.
+
+    A heartbeat coroutine wakes every `interval_seconds` and reports how late it
+    ran (scheduling lag). A watchdog thread notices when the heartbeat has been
+    late by more than `threshold_seconds` and, while the loop is still stuck,
+    captures the loop thread's stack and the route of the task that is running.
+    """
+
+    def __init__(self, threshold_seconds=0.25, interval_seconds=0.1, on_lag=None, on_block=None):
+        self.threshold_seconds = threshold_seconds
+        self.interval_seconds = interval_seconds
+        self.on_lag = on_lag  # on_lag(lag_seconds), on the loop
+        self.on_block = on_block  # on_block(stalled_seconds, route, stack), on the watchdog thread
+        self.task_scopes = weakref.WeakKeyDictionary()  # task -> ASGI scope, see TaskRouteMiddleware
+
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_beat = None
+        self._heartbeat_task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            self._last_beat = time.monotonic()
+            if self.on_lag is not None:
+                self.on_lag(max(self._last_beat - expected, 0.0))
+
+    def current_route(self):
+        """Route template (or path) of the task running on the loop right now"""
+        task = asyncio.current_task(self._loop)
+        scope = self.task_scopes.get(task) if task is not None else None
+        if scope is None:
+            return "background"
+        route = scope.get("route")
+        return route.path if route is not None else scope.get("path", "unknown")
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold_seconds / 2):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat - self.interval_seconds
+            if stalled < self.threshold_seconds or beat == reported_beat:
+                continue
+            # Report each stall once, while the offending frame is still on the stack
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            if self.on_block is not None:
+                try:
+                    self.on_block(stalled, self.current_route(), stack)
+                except Exception as e:
+                    logger.exception("Error reporting blocked event loop: %s", e)
+
+
+class TaskRouteMiddleware:
+    """Pure ASGI middleware recording which request each task serves.
+
+    Install it innermost so it runs in the same task as the endpoint; the
+    route template is filled into the scope by the router afterwards.
+    """
+
+    def __init__(self, app, monitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            task = asyncio.current_task()
+            if task is not None:
+                self.monitor.task_scopes[task] = scope
+        await self.app(scope, receive, send)
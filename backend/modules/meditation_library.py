@@ -0,0 +1,113 @@
+import asyncio
+import re
+import time
+import weakref
+from collections import OrderedDict
+
+import orjson
+from pymongo import ASCENDING, TEXT
+
+from modules.compression import PrecompressedPayload
+
+_MINUTES = re.compile(r"(\d+)")
+
+# Stored only to filter on; clients get the "duration" label
+_PROJECTION = {"_id": 0, "duration_minutes": 0}
+
+
+def duration_minutes(duration):
+    """Minutes from a duration label such as "10 minutes"; None if it has no number"""
+    match = _MINUTES.search(str(duration))
+    return int(match.group(1)) if match else None
+
+
+def to_document(item):
+    return {**item, "duration_minutes": duration_minutes(item.get("duration"))}
+
+
+class MeditationLibrary:
+    """Meditation content stored in Mongo, searched and paginated through a payload cache.
+
+    Each distinct query (text, filters, page) is answered from Mongo once per
+    `cache_ttl_seconds` and then served as a PrecompressedPayload, so repeated
+    browsing costs a dict lookup regardless of how large the library grows.
+    Concurrent misses on the same query wait for a single rebuild.
+    """
+
+    def __init__(self, collection, cache_ttl_seconds=300, cache_size=256, max_page_size=50):
+        self.collection = collection
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_size = cache_size
+        self.max_page_size = max_page_size
+        self._cache = OrderedDict()  # query key -> (built_at, payload), least recently used first
+        self._locks = weakref.WeakValueDictionary()  # query key -> lock held while it is rebuilt
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("title", TEXT), ("description", TEXT)], name="title_description_text")
+        for field in ("category", "difficulty", "duration_minutes", "type"):
+            await self.collection.create_index([(field, ASCENDING), ("title", ASCENDING)])
+        await self.collection.create_index("title")
+
+    async def search(self, text=None, content_type=None, category=None, difficulty=None,
+                     duration=None, max_duration=None, page=1, page_size=20) -> PrecompressedPayload:
+        text = (text or "").strip() or None
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), self.max_page_size)
+        key = (text and text.lower(), content_type, category, difficulty, duration, max_duration, page, page_size)
+
+        payload = self._cached(key)
+        if payload is not None:
+            return payload
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            # Whoever held the lock may have just rebuilt it
+            payload = self._cached(key)
+            if payload is None:
+                payload = await self._build(key, text, content_type, category, difficulty,
+                                            duration, max_duration, page, page_size)
+        return payload
+
+    def _cached(self, key):
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl_seconds:
+            self._cache.move_to_end(key)
+            return cached[1]
+        return None
+
+    async def _build(self, key, text, content_type, category, difficulty, duration, max_duration, page, page_size):
+        query = {}
+        if text:
+            query["$text"] = {"$search": text}
+        for field, value in (("type", content_type), ("category", category), ("difficulty", difficulty)):
+            if value is not None:
+                query[field] = value
+        if duration is not None:
+            query["duration_minutes"] = duration
+        elif max_duration is not None:
+            query["duration_minutes"] = {"$lte": max_duration}
+
+        sort = [("title", ASCENDING)]
+        if text:
+            sort.insert(0, ("score", {"$meta": "textScore"}))
+        cursor = self.collection.find(query, _PROJECTION).sort(sort).skip((page - 1) * page_size).limit(page_size)
+        items = await cursor.to_list(page_size)
+        total = await self.collection.count_documents(query)
+
+        # Built per cache entry rather than once, so spend less effort than for static payloads
+        payload = PrecompressedPayload(orjson.dumps({
+            "status": "success",
+            "content": items,
+            "total_count": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": -(-total // page_size),
+        }), brotli_quality=5, gzip_level=6)
+
+        self._cache[key] = (time.monotonic(), payload)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return payload
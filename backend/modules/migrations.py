@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+LOCK_ID = "migrations"
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[..., Awaitable[None]]  # apply(db); must be safe to re-run after a crash
+
+
+def load_seed(path):
+    """Documents from a JSON seed file (a list of objects)"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def upsert_by_key(collection, documents, key, overwrite=False):
+    """Bulk upsert `documents` matched on their natural `key`; returns (inserted, modified).
+
+    Only missing documents are inserted by default, so edits made in the
+    database survive re-seeding; pass overwrite=True to reset existing ones to
+    the seed. Documents without an "id" get a fresh UUID on insert only, so ids
+    already handed out to clients are kept either way.
+    """
+    if not documents:
+        return 0, 0
+    operations = []
+    for document in documents:
+        on_insert = {} if "id" in document else {"id": str(uuid.uuid4())}
+        if overwrite:
+            update = {"$set": document}
+        else:
+            update = {}
+            on_insert.update(document)
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        operations.append(UpdateOne({key: document[key]}, update, upsert=True))
+    result = await collection.bulk_write(operations, ordered=False)
+    return result.upserted_count, result.modified_count
+
+
+async def drop_duplicates(collection, key):
+    """Keep the oldest document per `key`; returns how many were deleted"""
+    duplicates = collection.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+    extra_ids = [doc_id async for group in duplicates for doc_id in group["ids"][1:]]
+    if not extra_ids:
+        return 0
+    result = await collection.delete_many({"_id": {"$in": extra_ids}})
+    return result.deleted_count
+
+
+class MigrationLockedError(Exception):
+    pass
+
+
+class MigrationRunner:
+    """Applies versioned migrations once per database.
+
+    Applied versions are recorded in `schema_migrations`. A lease in
+    `schema_migrations_lock` keeps concurrent runners (parallel deploys) from
+    applying the same migration twice; a lease left by a crashed runner
+    expires after `lock_seconds`. The lease is renewed before each migration,
+    so `lock_seconds` must cover the slowest single migration.
+    """
+
+    def __init__(self, db, migrations, lock_seconds=600):
+        versions = [migration.version for migration in migrations]
+        if len(set(versions)) != len(versions):
+            raise ValueError("Duplicate migration versions")
+        self.db = db
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.lock_seconds = lock_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def applied(self):
+        """Version -> record of every applied migration"""
+        return {record["_id"]: record async for record in self.db.schema_migrations.find()}
+
+    async def pending(self, target=None):
+        applied = await self.applied()
+        return [
+            migration for migration in self.migrations
+            if migration.version not in applied and (target is None or migration.version <= target)
+        ]
+
+    async def acquire_lock(self):
+        now = datetime.utcnow()
+        for _ in range(2):
+            try:
+                await self.db.schema_migrations_lock.insert_one({
+                    "_id": LOCK_ID,
+                    "owner": self.owner,
+                    "acquired_at": now,
+                    "expires_at": now + timedelta(seconds=self.lock_seconds),
+                })
+                return True
+            except DuplicateKeyError:
+                # Take over only a lease that has run out
+                await self.db.schema_migrations_lock.delete_one({"_id": LOCK_ID, "expires_at": {"$lt": now}})
+        return False
+
+    async def renew_lock(self):
+        """Push our lease out another `lock_seconds`; raises MigrationLockedError if it was taken over"""
+        result = await self.db.schema_migrations_lock.update_one(
+            {"_id": LOCK_ID, "owner": self.owner},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lock_seconds)}},
+        )
+        if result.matched_count == 0:
+            raise MigrationLockedError("Migration lock expired and was taken over by another runner")
+
+    async def release_lock(self):
+        await self.db.schema_migrations_lock.delete_one({"_id": LOCK_ID, "owner": self.owner})
+
+    async def migrate(self, target=None, wait_seconds=0):
+        """Apply pending migrations in version order; returns the versions applied.
+
+        Waits up to `wait_seconds` for another runner's lock, then raises
+        MigrationLockedError.
+        """
+        deadline = time.monotonic() + wait_seconds
+        while not await self.acquire_lock():
+            if time.monotonic() >= deadline:
+                raise MigrationLockedError("Another migration run holds the lock")
+            await asyncio.sleep(1)
+
+        applied = []
+        try:
+            # Re-read under the lock: another runner may have just finished
+            for migration in await self.pending(target):
+                # Each migration gets a full lease; a run slower than that must not continue
+                # once another runner may have taken over
+                await self.renew_lock()
+                started = time.perf_counter()
+                logger.info("Applying migration %d %s", migration.version, migration.name)
+                await migration.apply(self.db)
+                await self.db.schema_migrations.insert_one({
+                    "_id": migration.version,
+                    "name": migration.name,
+                    "applied_at": datetime.utcnow(),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "applied_by": self.owner,
+                })
+                applied.append(migration.version)
+        finally:
+            await self.release_lock()
+        return applied
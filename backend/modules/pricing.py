@@ -0,0 +1,80 @@
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+DEFAULT_CURRENCY = "INR"
+
+# Currency markers the AI and fallback lists put in front of prices
+CURRENCY_ALIASES = {
+    "₹": "INR",
+    "rs": "INR",
+    "rs.": "INR",
+    "inr": "INR",
+    "$": "USD",
+    "usd": "USD",
+}
+
+CURRENCY_SYMBOLS = {
+    "INR": "₹",
+    "USD": "$",
+}
+
+_PRICE_PATTERN = re.compile(
+    r"^\s*(?P<currency>₹|rs\.?|inr|\$|usd)?\s*(?P<amount>\d[\d,]*(?:\.\d+)?)\s*(?P<suffix>/-)?\s*$",
+    re.IGNORECASE,
+)
+
+
+class PriceParseError(ValueError):
+    """Raised when a price string cannot be normalized"""
+
+
+def parse_price(price, default_currency=DEFAULT_CURRENCY):
+    """Normalize a price like "₹1,999", "₹299.50", "Rs 299" or 299 into (paise, currency)"""
+    if isinstance(price, bool) or price is None:
+        raise PriceParseError(f"Invalid price: {price!r}")
+
+    if isinstance(price, (int, float, Decimal)):
+        amount = Decimal(str(price))
+        currency = default_currency
+    else:
+        match = _PRICE_PATTERN.match(str(price))
+        if not match:
+            raise PriceParseError(f"Invalid price: {price!r}")
+        try:
+            amount = Decimal(match.group("amount").replace(",", ""))
+        except InvalidOperation:
+            raise PriceParseError(f"Invalid price: {price!r}")
+        marker = match.group("currency")
+        currency = CURRENCY_ALIASES[marker.lower()] if marker else default_currency
+
+    if amount < 0:
+        raise PriceParseError(f"Negative price: {price!r}")
+
+    paise = int((amount * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    return paise, currency
+
+
+def paise_to_amount(paise):
+    """Convert integer paise to a rupee amount, keeping whole amounts as int"""
+    if paise % 100 == 0:
+        return paise // 100
+    return float(Decimal(paise) / 100)
+
+
+def format_price(paise, currency=DEFAULT_CURRENCY):
+    """Render integer paise back into a display string like "₹1,999" or "₹299.50" """
+    symbol = CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+    rupees, remainder = divmod(paise, 100)
+    if remainder:
+        return f"{symbol}{rupees:,}.{remainder:02d}"
+    return f"{symbol}{rupees:,}"
+
+
+def annotate_price(product, default_currency=DEFAULT_CURRENCY):
+    """Attach price_paise/currency to a product dict once; unparseable prices get None"""
+    try:
+        product["price_paise"], product["currency"] = parse_price(product.get("price"), default_currency)
+    except PriceParseError:
+        product["price_paise"] = None
+        product["currency"] = default_currency
+    return product
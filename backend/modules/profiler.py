@@ -0,0 +1,110 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a helper thread.
+
+    Profiling the event loop thread captures whatever runs on the loop while the
+    profiled request is in flight, including other requests' callbacks; the
+    output is meant for spotting CPU hot spots, not exact per-request attribution.
+    """
+
+    def __init__(self, thread_id, interval_seconds=0.005):
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[collapse_stack(frame)] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+def collapse_stack(frame):
+    """Root-first 'file:function;file:function' line in the collapsed-stack format"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _slug(route):
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_")[:80] or "root"
+
+
+class ProfileStore:
+    """Collapsed-stack profiles on disk, each with a JSON metadata sidecar"""
+
+    def __init__(self, directory, max_profiles=200):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def save(self, stacks, **metadata):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{_slug(metadata.get('route', ''))}_{uuid.uuid4().hex[:8]}"
+        with open(os.path.join(self.directory, f"{profile_id}.collapsed"), "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump({"id": profile_id, "created_at": time.time(), "samples": sum(stacks.values()), **metadata}, f)
+        self._prune()
+        return profile_id
+
+    def _metadata_files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+        return sorted(files, key=os.path.getmtime, reverse=True)
+
+    def _prune(self):
+        for path in self._metadata_files()[self.max_profiles:]:
+            for name in (path, path[:-len(".json")] + ".collapsed"):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit=50):
+        profiles = []
+        for path in self._metadata_files()[:limit]:
+            try:
+                with open(path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def read(self, profile_id):
+        """Collapsed stacks for one profile, or None if unknown"""
+        if not re.fullmatch(r"[A-Za-z0-9_]+", profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.collapsed")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read()
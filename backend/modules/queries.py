@@ -0,0 +1,63 @@
+from functools import lru_cache
+from typing import List
+
+from pydantic import TypeAdapter
+
+
+# $dateToString format matching datetime.isoformat() up to Mongo's millisecond precision
+ISO_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%L"
+
+
+def projection(*fields, **computed):
+    """Inclusion projection of `fields` plus computed expressions, without _id.
+
+    Declaring what an endpoint returns keeps the rest of each document (and
+    Mongo's _id) on the server instead of stripping it in Python afterwards.
+    """
+    spec = {name: 1 for name in fields}
+    spec.update(computed)
+    spec["_id"] = 0
+    return spec
+
+
+def iso_string(field):
+    """Projection expression rendering a date field as an ISO-8601 string.
+
+    Values already stored as strings (most of ours are) pass through unchanged.
+    """
+    path = f"${field}"
+    return {
+        "$cond": [
+            {"$eq": [{"$type": path}, "date"]},
+            {"$dateToString": {"date": path, "format": ISO_DATE_FORMAT}},
+            path,
+        ]
+    }
+
+
+@lru_cache(maxsize=None)
+def model_projection(model):
+    """Projection returning exactly the model's fields, without _id"""
+    return projection(*model.model_fields)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model):
+    return TypeAdapter(List[model])
+
+
+async def find_models(collection, model, query=None, limit=1000):
+    """Load documents as `model` instances, fetching only the model's fields.
+
+    All documents are validated in a single TypeAdapter call; in
+    benchmarks/bench_serialization.py that beats both Model(**doc) and
+    model_construct, which each pay a Python-level call per document.
+    """
+    docs = await collection.find(query or {}, model_projection(model)).to_list(limit)
+    return _list_adapter(model).validate_python(docs)
+
+
+async def find_model(collection, model, query):
+    """Single-document variant of find_models; None if nothing matches"""
+    doc = await collection.find_one(query, model_projection(model))
+    return None if doc is None else model.model_validate(doc)
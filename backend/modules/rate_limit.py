@@ -0,0 +1,95 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    remaining: float
+    retry_after: int  # seconds until `cost` tokens are available; 0 when allowed
+
+
+def _retry_after(tokens, cost, refill_per_second):
+    return max(1, math.ceil((cost - tokens) / refill_per_second))
+
+
+class InMemoryTokenBucketBackend:
+    """Per-process buckets; fine for a single worker, each worker limits separately otherwise.
+
+    At most `max_keys` buckets are kept; the least recently used one is evicted
+    (it simply starts full again if that client comes back).
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at), least recently used first
+
+    async def consume(self, key, cost, capacity, refill_per_second):
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        if allowed:
+            return RateLimitResult(True, tokens, 0)
+        return RateLimitResult(False, tokens, _retry_after(tokens, cost, refill_per_second))
+
+
+class MongoTokenBucketBackend:
+    """Buckets shared by all workers, refilled and debited atomically with one pipeline update"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def consume(self, key, cost, capacity, refill_per_second):
+        now = time.time()
+        elapsed = {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, refill_per_second]}]}]}
+
+        update = [
+            {"$set": {"tokens": refilled, "updated_at": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                # TTL index on expires_at drops buckets once they would be full again
+                "expires_at": datetime.utcnow() + timedelta(seconds=capacity / refill_per_second),
+            }},
+        ]
+        for attempt in range(2):
+            try:
+                bucket = await self.collection.find_one_and_update(
+                    {"_id": key}, update, upsert=True, return_document=ReturnDocument.AFTER,
+                )
+                break
+            except DuplicateKeyError:
+                # Two first requests raced to create the bucket; it exists now, so a retry updates it
+                if attempt:
+                    raise
+
+        if bucket["allowed"]:
+            return RateLimitResult(True, bucket["tokens"], 0)
+        return RateLimitResult(False, bucket["tokens"], _retry_after(bucket["tokens"], cost, refill_per_second))
+
+
+class RateLimiter:
+    """Token bucket limiter: `capacity` tokens per key, refilled at `refill_per_second`"""
+
+    def __init__(self, backend, capacity, refill_per_second):
+        self.backend = backend
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+
+    async def consume(self, key, cost=1):
+        return await self.backend.consume(key, cost, self.capacity, self.refill_per_second)
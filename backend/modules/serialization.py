@@ -0,0 +1,53 @@
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _default(value):
+    # Only reached for types orjson doesn't handle natively (datetime, UUID,
+    # dataclasses and enums never get here)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """Default response class: orjson rendering, with fallbacks for models and ObjectIds"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content: Any, status_code: int = 200, headers=None) -> Response:
+    """Render plain data straight to JSON, skipping FastAPI's jsonable_encoder pass"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+@lru_cache(maxsize=None)
+def type_adapter(annotation) -> TypeAdapter:
+    """Shared TypeAdapter per type; building one compiles a serializer, so reuse it"""
+    return TypeAdapter(annotation)
+
+
+def model_response(annotation, value: Any, status_code: int = 200, headers=None) -> Response:
+    """Serialize trusted model instances with pydantic-core in one pass.
+
+    Returning a Response bypasses the response_model re-validation FastAPI
+    otherwise performs on objects we just built ourselves.
+    """
+    return Response(
+        content=type_adapter(annotation).dump_json(value),
+        status_code=status_code,
+        headers=headers,
+        media_type=JSON_MEDIA_TYPE,
+    )
@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+# Commands whose plan can be captured with the explain command
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Driver-added fields that explain rejects or that don't affect the plan
+_SESSION_FIELDS = {"lsid", "txnNumber", "readConcern", "writeConcern", "autocommit", "startTransaction"}
+
+
+def query_shape(value):
+    """Replace literal values with "?" so queries differing only by value group together"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+def command_shape(command_name, command):
+    """Filter/sort/pipeline shape of a command, whichever parts it has"""
+    if command_name == "find":
+        return {"filter": query_shape(command.get("filter", {})), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        return {"pipeline": query_shape(command.get("pipeline", []))}
+    if command_name in ("count", "distinct"):
+        return {"filter": query_shape(command.get("query", {}))}
+    if command_name == "findAndModify":
+        return {"filter": query_shape(command.get("query", {})), "sort": command.get("sort")}
+    if command_name == "update":
+        return {"filter": [query_shape(update.get("q", {})) for update in command.get("updates", [])[:1]]}
+    if command_name == "delete":
+        return {"filter": [query_shape(delete.get("q", {})) for delete in command.get("deletes", [])[:1]]}
+    return {}
+
+
+def docs_returned(command_name, reply):
+    """Documents returned or affected, as far as the reply tells"""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return reply.get("n")
+
+
+def summarize_explain(explain):
+    """Winning plan stages and examined counts from an executionStats explain"""
+    stages = []
+    plan = _find_key(explain, "winningPlan")
+    while isinstance(plan, dict):
+        stages.append(plan.get("stage", "?"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0] or plan.get("queryPlan")
+    stats = _find_key(explain, "executionStats") or {}
+    return {
+        "plan": " <- ".join(stages),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+def _find_key(document, key):
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        children = document.values()
+    elif isinstance(document, list):
+        children = document
+    else:
+        return None
+    for child in children:
+        found = _find_key(child, key)
+        if found is not None:
+            return found
+    return None
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """pymongo command listener keeping every command slower than `threshold_seconds`.
+
+    Slow commands are aggregated per (database, collection, command, shape). Once a
+    shape has been slow `explain_after` times its plan is captured once with
+    `explain(database_name, command)`, scheduled on the event loop from the
+    listener thread.
+    """
+
+    def __init__(self, threshold_seconds=0.1, explain_after=3, max_shapes=500, recent_size=100, on_slow=None):
+        self.threshold_seconds = threshold_seconds
+        self.explain_after = explain_after
+        self.max_shapes = max_shapes
+        self.on_slow = on_slow  # on_slow(record), on the listener thread
+        self.shapes = {}
+        self.recent = deque(maxlen=recent_size)
+
+        self._commands = {}
+        self._explain_tasks = set()  # the loop only keeps weak references to tasks
+        self._lock = threading.Lock()
+        self._loop = None
+        self._explain = None
+
+    def attach(self, loop, explain):
+        """Enable explain capture; `explain` is a coroutine function run on `loop`"""
+        self._loop = loop
+        self._explain = explain
+
+    def started(self, event):
+        if event.command_name != "explain":
+            self._commands[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def failed(self, event):
+        self._commands.pop((event.connection_id, event.request_id), None)
+
+    def succeeded(self, event):
+        started = self._commands.pop((event.connection_id, event.request_id), None)
+        duration = event.duration_micros / 1e6
+        if started is None or duration < self.threshold_seconds:
+            return
+
+        database_name, command = started
+        collection = command.get(event.command_name)
+        shape = command_shape(event.command_name, command)
+        record = {
+            "database": database_name,
+            "collection": collection if isinstance(collection, str) else "",
+            "command": event.command_name,
+            "shape": shape,
+            "duration_ms": round(duration * 1000, 1),
+            "docs_returned": docs_returned(event.command_name, event.reply),
+            "at": time.time(),
+        }
+        key = (database_name, record["collection"], event.command_name, json.dumps(shape, sort_keys=True, default=str))
+
+        with self._lock:
+            self.recent.append(record)
+            entry = self.shapes.get(key)
+            if entry is None:
+                if len(self.shapes) >= self.max_shapes:
+                    # Forget the shape that has cost the least so far
+                    del self.shapes[min(self.shapes, key=lambda k: self.shapes[k]["total_ms"])]
+                entry = self.shapes[key] = {
+                    "database": database_name,
+                    "collection": record["collection"],
+                    "command": event.command_name,
+                    "shape": shape,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_docs_returned": None,
+                    "last_seen": None,
+                    "explain": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += record["duration_ms"]
+            entry["max_ms"] = max(entry["max_ms"], record["duration_ms"])
+            entry["last_docs_returned"] = record["docs_returned"]
+            entry["last_seen"] = record["at"]
+            capture_explain = (
+                self._explain is not None
+                and self.explain_after
+                and entry["count"] == self.explain_after
+                and event.command_name in EXPLAINABLE_COMMANDS
+            )
+
+        if self.on_slow is not None:
+            self.on_slow(record)
+        if capture_explain:
+            explain_command = {k: v for k, v in command.items() if not k.startswith("$") and k not in _SESSION_FIELDS}
+            self._loop.call_soon_threadsafe(self._schedule_explain, key, database_name, explain_command)
+
+    def _schedule_explain(self, key, database_name, command):
+        task = self._loop.create_task(self._capture_explain(key, database_name, command))
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _capture_explain(self, key, database_name, command):
+        try:
+            summary = summarize_explain(await self._explain(database_name, command))
+        except Exception as e:
+            summary = {"error": str(e)}
+        with self._lock:
+            if key in self.shapes:
+                self.shapes[key]["explain"] = summary
+
+    def top(self, limit=20):
+        """Slow shapes ordered by total time spent"""
+        with self._lock:
+            entries = sorted(self.shapes.values(), key=lambda entry: entry["total_ms"], reverse=True)[:limit]
+            return [
+                {**entry, "total_ms": round(entry["total_ms"], 1), "avg_ms": round(entry["total_ms"] / entry["count"], 1)}
+                for entry in entries
+            ]
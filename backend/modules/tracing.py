@@ -0,0 +1,265 @@
+import abc
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "nutracia-backend"
+
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_exporter = None
+_sample_rate = 1.0
+
+
+class Span:
+    """One timed operation; `recording` is False for traces dropped by sampling"""
+
+    def __init__(self, name, trace_id, parent_span_id=None, recording=True, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.recording = recording
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key, value):
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        if self.recording and _exporter is not None:
+            _exporter.export(self)
+
+
+def configure(exporter, sample_rate=1.0):
+    """Install the exporter spans are sent to; None disables tracing"""
+    global _exporter, _sample_rate
+    _exporter = exporter
+    _sample_rate = sample_rate
+
+
+def shutdown():
+    if _exporter is not None:
+        _exporter.shutdown()
+
+
+def current_span():
+    return _current_span.get()
+
+
+def parse_traceparent(header):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None"""
+    parts = (header or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3].endswith("1")
+
+
+def new_span(name, parent=None, traceparent=None, **attributes):
+    """Create a span under `parent` (default: the current span) without activating it"""
+    parent = parent or _current_span.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, parent.recording, attributes)
+
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_span_id, sampled = remote
+        return Span(name, trace_id, parent_span_id, sampled and _exporter is not None, attributes)
+
+    recording = _exporter is not None and random.random() < _sample_rate
+    return Span(name, os.urandom(16).hex(), None, recording, attributes)
+
+
+@contextmanager
+def start_span(name, traceparent=None, **attributes):
+    """Run the block inside a child span of the current one (a new trace at the top level)"""
+    span = new_span(name, traceparent=traceparent, **attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_json(spans):
+    """Encode spans as an OTLP/JSON ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "modules.tracing"},
+                "spans": [
+                    {
+                        "traceId": span.trace_id,
+                        "spanId": span.span_id,
+                        "parentSpanId": span.parent_span_id or "",
+                        "name": span.name,
+                        "kind": 1,
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns),
+                        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+                        "status": {"code": span.status, "message": span.status_message},
+                    }
+                    for span in spans
+                ],
+            }],
+        }]
+    }
+
+
+class BatchExporter(abc.ABC):
+    """Queues finished spans and ships them in batches from a background thread"""
+
+    def __init__(self, max_batch_size=512, flush_interval_seconds=1.0, max_queue_size=10000):
+        self.max_batch_size = max_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval_seconds))
+                while len(batch) < self.max_batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if None in batch:  # shutdown sentinel
+                batch = [span for span in batch if span is not None]
+                self._send_safely(batch)
+                return
+            self._send_safely(batch)
+
+    def _send_safely(self, batch):
+        if not batch:
+            return
+        try:
+            self.send(batch)
+        except Exception as e:
+            logger.warning("Error exporting %s spans: %s", len(batch), e)
+
+    @abc.abstractmethod
+    def send(self, spans):
+        ...
+
+    def shutdown(self, timeout=5.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+class OTLPJsonFileExporter(BatchExporter):
+    """Appends one OTLP/JSON export request per line, rotating the file at `max_bytes`"""
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, **options):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        super().__init__(**options)
+
+    def send(self, spans):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, f"{self.path}.1")
+        with open(self.path, "a") as f:
+            f.write(json.dumps(to_otlp_json(spans)) + "\n")
+
+
+class OTLPHttpExporter(BatchExporter):
+    """Posts OTLP/JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint, timeout_seconds=5.0, **options):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout_seconds = timeout_seconds
+        super().__init__(**options)
+
+    def send(self, spans):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(to_otlp_json(spans)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout_seconds):
+            pass
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """pymongo command listener recording a child span per Mongo command.
+
+    Motor runs each operation on its executor inside a copy of the caller's
+    context, so the listener sees the request's current span as the parent.
+    """
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event):
+        parent = _current_span.get()
+        if parent is None or not parent.recording:
+            return
+        collection = event.command.get(event.command_name)
+        span = new_span(
+            f"mongo.{event.command_name}",
+            parent=parent,
+            **{"db.system": "mongodb", "db.name": event.database_name, "db.operation": event.command_name},
+        )
+        if isinstance(collection, str):
+            span.set_attribute("db.mongodb.collection", collection)
+        self._spans[(event.connection_id, event.request_id)] = span
+
+    def succeeded(self, event):
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.end()
+
+    def failed(self, event):
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.status = STATUS_ERROR
+            span.status_message = str(event.failure.get("errmsg", ""))
+            span.end()
@@ -0,0 +1,152 @@
+import math
+
+# Static instructions go first and never change between users or categories, so
+# the provider's prompt cache can reuse them; the per-user profile follows and is
+# shared by every category prompt of one request; only the short category
+# instruction at the end differs between calls.
+WELLNESS_SYSTEM_INSTRUCTIONS = """You are a professional wellness coach for Nutracía.
+Return ONLY valid JSON in exactly the shape requested, no additional text or formatting.
+
+Each recommendation is an object with exactly these fields:
+{
+  "title": "Short, specific title",
+  "description": "One or two sentences explaining why this fits the user's profile",
+  "duration": "Time needed, e.g. \\"45-60 min\\" or \\"25 min prep\\"",
+  "level": "Difficulty or suitability, e.g. \\"Beginner to Advanced\\"",
+  "requirements": ["What the user needs", "..."],
+  "steps": ["Concrete step with timing", "..."],
+  "youtube_video": "https://www.youtube.com/results?search_query=<words+joined+by+plus>",
+  "product_links": ["https://amazon.com/s?k=<query>", "https://flipkart.com/search?q=<query>"],
+  "image_url": "<category>_<short_slug>.jpg"
+}
+
+Rules:
+- Tailor every field to the user profile below.
+- Never suggest anything that conflicts with the user's allergies or health conditions.
+- Keep descriptions concise; steps should be actionable.
+"""
+
+CATEGORY_INSTRUCTIONS = {
+    'workout': "3 personalized workout recommendations suited to {fitness_level} fitness level.",
+    'diet': "3 personalized diet recommendations for the user's weight goals. AVOID these allergies: {allergies}.",
+    'skincare': "3 personalized skincare recommendations for a {age} year old {gender}.",
+    'health': (
+        "3 personalized health management recommendations focusing on: {health_focus}. "
+        "Each object must also include a \"motivational_quote\" field ending with "
+        "\"BELIEVE NUTRACIAA YOU WILL HEAL SOON!\""
+    ),
+}
+
+# Bump when prompts change so cached recommendations built from older prompts are regenerated
+WELLNESS_PROMPT_VERSION = 1
+
+# Rough per-message overhead of the chat format
+TOKENS_PER_MESSAGE = 4
+
+_encoders = {}
+
+
+def build_profile_summary(request):
+    """Render the user profile block shared by every category prompt"""
+    return (
+        f"Weight: {request.weight}\n"
+        f"Allergies: {request.allergies}\n"
+        f"Wellness Goals: {', '.join(request.wellness_goals)}\n"
+        f"Health Conditions: {', '.join(request.health_conditions)}\n"
+        f"Age: {request.age}\n"
+        f"Gender: {request.gender}\n"
+        f"Fitness Level: {request.fitness_level}"
+    )
+
+
+def build_shared_prefix(profile_summary):
+    """System message shared by all category calls of one request"""
+    return f"{WELLNESS_SYSTEM_INSTRUCTIONS}\nUser profile:\n{profile_summary}\n"
+
+
+def _category_instruction(category, request):
+    health_focus = ', '.join(request.health_conditions) if request.health_conditions else 'general wellness'
+    return CATEGORY_INSTRUCTIONS[category].format(
+        fitness_level=request.fitness_level,
+        allergies=request.allergies,
+        age=request.age,
+        gender=request.gender,
+        health_focus=health_focus,
+    )
+
+
+def build_category_prompt(category, request):
+    """Short category-specific user message appended after the shared prefix"""
+    return f"Generate {_category_instruction(category, request)} Return ONLY the JSON array."
+
+
+def build_combined_prompt(categories, request):
+    """One user message asking for several categories as a single JSON object"""
+    lines = [f'- "{category}": {_category_instruction(category, request)}' for category in categories]
+    keys = ", ".join(f'"{category}"' for category in categories)
+    return (
+        "Generate recommendations for each of these categories:\n"
+        + "\n".join(lines)
+        + f"\n\nReturn ONLY a JSON object with the keys {keys}; each value is the JSON array "
+        "of recommendation objects for that category."
+    )
+
+
+def build_messages(shared_prefix, user_prompt):
+    return [
+        {"role": "system", "content": shared_prefix},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _get_encoder(model):
+    """Load a tiktoken encoder if available; None means fall back to an estimate"""
+    if model not in _encoders:
+        try:
+            import tiktoken
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            _encoders[model] = None
+    return _encoders[model]
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Count tokens with tiktoken, or estimate at ~4 characters per token"""
+    encoder = _get_encoder(model)
+    if encoder is None:
+        return math.ceil(len(text) / 4)
+    return len(encoder.encode(text))
+
+
+def count_message_tokens(messages, model="gpt-3.5-turbo"):
+    return sum(count_tokens(m["content"], model) + TOKENS_PER_MESSAGE for m in messages)
+
+
+class TokenBudget:
+    """Per-request token budget shared by all LLM calls made for that request"""
+
+    def __init__(self, total_tokens, max_completion_tokens):
+        self.total_tokens = total_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.used_tokens = 0
+
+    @property
+    def remaining(self):
+        return max(self.total_tokens - self.used_tokens, 0)
+
+    def reserve(self, prompt_tokens, min_completion_tokens=200, max_completion_tokens=None):
+        """Reserve prompt + completion tokens; returns the max_tokens to send, or None if over budget"""
+        completion_cap = max_completion_tokens or self.max_completion_tokens
+        completion_tokens = min(completion_cap, self.remaining - prompt_tokens)
+        if completion_tokens < min_completion_tokens:
+            return None
+        self.used_tokens += prompt_tokens + completion_tokens
+        return completion_tokens
+
+    def settle(self, reserved_completion_tokens, actual_completion_tokens):
+        """Return unused completion tokens to the budget once the real usage is known"""
+        if actual_completion_tokens is not None:
+            self.used_tokens -= max(reserved_completion_tokens - actual_completion_tokens, 0)
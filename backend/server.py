@@ -1,29 +1,197 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import List, Literal, Optional, Dict, Any
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from passlib.context import CryptContext
-import openai
 import json
 import asyncio
+import time
+import hashlib
+import hmac
+import random
+import sys
+import threading
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
+sys.path.append(str(ROOT_DIR))
+
+from config.settings import (
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    CIRCUIT_BREAKER_FAILURE_RATE,
+    CIRCUIT_BREAKER_LATENCY_THRESHOLD_SECONDS,
+    CIRCUIT_BREAKER_MIN_CALLS,
+    CIRCUIT_BREAKER_OPEN_SECONDS,
+    CIRCUIT_BREAKER_WINDOW_SIZE,
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    LLM_HEDGE_AFTER_SECONDS,
+    LLM_PRELOAD_SDKS,
+    LLM_PROVIDERS,
+    LLM_TIMEOUT_SECONDS,
+    LOG_FORMAT,
+    LOG_INFO_SAMPLE_RATE,
+    LOG_LEVEL,
+    OPENAI_MODEL,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_CAPACITY,
+    RATE_LIMIT_REFILL_PER_SECOND,
+    RATE_LIMIT_ROUTE_COSTS,
+    RATE_LIMIT_TRUST_FORWARDED_FOR,
+    RATE_LIMIT_TRUSTED_PROXY_HOPS,
+    SLOW_QUERY_EXPLAIN_AFTER,
+    SLOW_QUERY_MAX_SHAPES,
+    SLOW_QUERY_THRESHOLD_MS,
+    TRACING_EXPORTER,
+    TRACING_FILE_PATH,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SAMPLE_RATE,
+)
+from modules.admission import AdmissionLimiter, OverloadedError, all_limiters, get_limiter
+from modules.circuit_breaker import CircuitOpenError, all_breakers, get_breaker
+from modules.compression import CompressionMiddleware, PrecompressedPayload
+from modules.llm_router import PROVIDERS, LLMRouter, create_provider
+from modules.logging_setup import configure_logging, request_id_var
+from modules.metrics import LLM_BUCKETS, Counter, Gauge, Histogram, MongoCommandMetrics, Registry
+from modules.queries import find_model, find_models, iso_string, projection
+from modules.rate_limit import InMemoryTokenBucketBackend, MongoTokenBucketBackend, RateLimiter
+from modules.serialization import FastJSONResponse, model_response, type_adapter
+from modules.slow_queries import SlowQueryLog
+from modules import tracing
+
+# Configure logging: JSON records written from a background thread via a queue
+log_listener = configure_logging(LOG_LEVEL, json_format=LOG_FORMAT == "json", info_sample_rate=LOG_INFO_SAMPLE_RATE)
+logger = logging.getLogger(__name__)
+
+# Metrics, exposed in Prometheus text format at /metrics
+metrics_registry = Registry()
+http_request_seconds = Histogram(metrics_registry, "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"])
+llm_request_seconds = Histogram(metrics_registry, "llm_request_duration_seconds", "LLM call latency per provider attempt", ["provider", "model", "category", "outcome"], buckets=LLM_BUCKETS)
+llm_tokens = Counter(metrics_registry, "llm_tokens_total", "LLM tokens used", ["provider", "category", "kind"])
+mongo_command_seconds = Histogram(metrics_registry, "mongo_command_duration_seconds", "MongoDB command latency", ["command", "collection"])
+mongo_command_failures = Counter(metrics_registry, "mongo_command_failures_total", "Failed MongoDB commands", ["command", "collection"])
+cache_requests = Counter(metrics_registry, "cache_requests_total", "Cache lookups by outcome (hit, stale, miss)", ["cache", "result"])
+event_loop_lag = Gauge(metrics_registry, "event_loop_lag_seconds", "Most recent event loop lag sample")
+event_loop_lag_seconds = Histogram(metrics_registry, "event_loop_lag_sample_seconds", "Event loop lag samples", buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+event_loop_blocked = Counter(metrics_registry, "event_loop_blocked_total", "Stalls of the event loop past LOOP_BLOCK_THRESHOLD_SECONDS", ["route"])
+admission_in_flight = Gauge(metrics_registry, "admission_in_flight", "Requests holding an admission slot", ["limiter"])
+admission_queue_depth = Gauge(metrics_registry, "admission_queue_depth", "Requests waiting for an admission slot", ["limiter"])
+admission_shed = Counter(metrics_registry, "admission_shed_total", "Requests shed since startup", ["limiter"])
+circuit_breaker_open = Gauge(metrics_registry, "circuit_breaker_open", "1 while the circuit is open or half-open", ["breaker"])
+circuit_breaker_p95_seconds = Gauge(metrics_registry, "circuit_breaker_p95_latency_seconds", "p95 latency over the breaker window", ["breaker"])
+
+# Tracing: one span per request with child spans for Mongo commands and LLM calls
+if TRACING_EXPORTER == "file":
+    tracing.configure(tracing.OTLPJsonFileExporter(TRACING_FILE_PATH), sample_rate=TRACING_SAMPLE_RATE)
+elif TRACING_EXPORTER == "otlp_http":
+    tracing.configure(tracing.OTLPHttpExporter(TRACING_OTLP_ENDPOINT), sample_rate=TRACING_SAMPLE_RATE)
+
+# Slow query log: commands over SLOW_QUERY_THRESHOLD_MS grouped by filter shape
+def report_slow_query(record: dict):
+    logger.warning("Slow query: %s %s %sms", record['command'], record['collection'], record['duration_ms'], extra={"slow_query": record})
+
+slow_query_log = SlowQueryLog(
+    threshold_seconds=SLOW_QUERY_THRESHOLD_MS / 1000,
+    explain_after=SLOW_QUERY_EXPLAIN_AFTER,
+    max_shapes=SLOW_QUERY_MAX_SHAPES,
+    on_slow=report_slow_query
+)
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[
+        MongoCommandMetrics(mongo_command_seconds, mongo_command_failures),
+        tracing.MongoCommandTracer(),
+        slow_query_log
+    ]
+)
 db = client[os.environ['DB_NAME']]
 
-# OpenAI client initialization
-openai_client = openai.OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+def llm_breaker(provider: str, model: str):
+    """Circuit breaker shared by every call to one LLM provider/model"""
+    return get_breaker(
+        provider, model,
+        window_size=CIRCUIT_BREAKER_WINDOW_SIZE,
+        min_calls=CIRCUIT_BREAKER_MIN_CALLS,
+        failure_rate_threshold=CIRCUIT_BREAKER_FAILURE_RATE,
+        latency_threshold_seconds=CIRCUIT_BREAKER_LATENCY_THRESHOLD_SECONDS,
+        open_seconds=CIRCUIT_BREAKER_OPEN_SECONDS
+    )
+
+def build_llm_providers():
+    """Providers named in LLM_PROVIDERS that have an API key configured; no SDK is imported yet"""
+    configured = {
+        "openai": (OPENAI_MODEL, os.environ.get('OPENAI_API_KEY'), {"timeout": LLM_TIMEOUT_SECONDS}),
+        "gemini": (GEMINI_MODEL, GEMINI_API_KEY, {}),
+    }
+    providers = []
+    for name in LLM_PROVIDERS:
+        if name not in configured or name not in PROVIDERS:
+            continue
+        model, api_key, options = configured[name]
+        if api_key:
+            providers.append(create_provider(name, model, api_key, **options))
+    return providers
+
+def observe_llm_attempt(provider, category, outcome, latency_seconds, result):
+    llm_request_seconds.observe(latency_seconds, provider=provider.name, model=provider.model, category=category or "", outcome=outcome)
+    if result is not None:
+        llm_tokens.inc(result.prompt_tokens or 0, provider=provider.name, category=category or "", kind="prompt")
+        llm_tokens.inc(result.completion_tokens or 0, provider=provider.name, category=category or "", kind="completion")
+
+# Both the grocery and wellness handlers go through the router, which picks the
+# provider with the best recent p95 per category and hedges calls slower than that
+# p95 to the next one
+llm_router = LLMRouter(
+    build_llm_providers(),
+    breaker_for=lambda provider: llm_breaker(provider.name, provider.model),
+    hedge_after_seconds=LLM_HEDGE_AFTER_SECONDS or None,
+    timeout=LLM_TIMEOUT_SECONDS,
+    observer=observe_llm_attempt
+)
+
+# Per-IP token buckets for the expensive endpoints; the Mongo backend shares
+# buckets between workers
+rate_limiter = RateLimiter(
+    MongoTokenBucketBackend(db.rate_limits) if RATE_LIMIT_BACKEND == "mongo" else InMemoryTokenBucketBackend(),
+    capacity=RATE_LIMIT_CAPACITY,
+    refill_per_second=RATE_LIMIT_REFILL_PER_SECOND
+)
+
+def client_ip(http_request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED_FOR:
+        # Entries left of the ones our proxies appended are written by the client and can't be trusted
+        hops = [hop.strip() for hop in http_request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if RATE_LIMIT_TRUSTED_PROXY_HOPS > 0 and len(hops) >= RATE_LIMIT_TRUSTED_PROXY_HOPS:
+            return hops[-RATE_LIMIT_TRUSTED_PROXY_HOPS]
+    return http_request.client.host if http_request.client else "unknown"
+
+async def enforce_rate_limit(route: str, http_request: Request):
+    """Debit the route's cost from the caller's bucket, raising 429 with Retry-After when empty"""
+    # Keyed on the client IP only: user ids arrive unauthenticated in the body, and a
+    # fresh one per request would otherwise get a fresh bucket
+    result = await rate_limiter.consume(f"ip:{client_ip(http_request)}", RATE_LIMIT_ROUTE_COSTS.get(route, 1))
+    if not result.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(result.retry_after)}
+        )
 
 # Password hashing utilities
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -36,12 +204,27 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
-# Create the main app without a prefix
-app = FastAPI()
+# Create the main app without a prefix; responses are rendered with orjson
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# LLM SDKs are imported on first use; with LLM_PRELOAD_SDKS they are preloaded in a
+# background thread once the worker is up, so the first LLM call doesn't wait either
+async def preload_llm_sdk(provider):
+    try:
+        await provider.ensure_loaded()
+    except Exception as e:
+        logger.warning("Error preloading %s SDK: %s", provider.name, e)
+
+@app.on_event("startup")
+async def preload_llm_sdks():
+    if not LLM_PRELOAD_SDKS:
+        return
+    for provider in llm_router.providers.values():
+        spawn_background_task(preload_llm_sdk(provider))
+
 # Authentication Models
 class SignupRequest(BaseModel):
     # Basic Credentials
@@ -191,125 +374,31 @@ class PersonalizedWellnessResponse(BaseModel):
     success: bool
     message: str
     recommendations: Dict[str, List[WellnessRecommendation]]
+    cached: bool = False
+    degraded: bool = False  # served cached/fallback content because generation was shed
 
-# Sample data initialization
 @api_router.on_event("startup")
-async def init_sample_data():
-    # Check if sample data exists
-    existing_workouts = await db.workouts.count_documents({})
-    if existing_workouts == 0:
-        # Initialize sample workouts
-        sample_workouts = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Upper Body Blast",
-                "description": "Intense upper body workout targeting chest, back, and arms",
-                "muscle_groups": ["chest", "back", "arms"],
-                "equipment": ["dumbbells", "bench"],
-                "duration": 45,
-                "difficulty": "intermediate",
-                "video_url": "https://www.youtube.com/watch?v=sample1",
-                "instructions": ["Warm up for 5 minutes", "3 sets of push-ups", "3 sets of rows", "Cool down"]
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Core Strength",
-                "description": "Build a strong core with targeted exercises",
-                "muscle_groups": ["core", "abs"],
-                "equipment": ["mat"],
-                "duration": 30,
-                "difficulty": "beginner",
-                "video_url": "https://www.youtube.com/watch?v=sample2",
-                "instructions": ["Warm up", "Planks 3x60s", "Crunches 3x20", "Mountain climbers 3x15"]
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "HIIT Cardio",
-                "description": "High-intensity interval training for fat burn",
-                "muscle_groups": ["full body"],
-                "equipment": ["none"],
-                "duration": 25,
-                "difficulty": "advanced",
-                "video_url": "https://www.youtube.com/watch?v=sample3",
-                "instructions": ["5 min warm up", "20s work/10s rest intervals", "Cool down stretches"]
-            }
-        ]
-        await db.workouts.insert_many(sample_workouts)
-
-        # Initialize sample skincare routines
-        sample_skincare = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Morning Glow Routine",
-                "description": "Start your day with radiant skin",
-                "skin_type": "normal",
-                "time_of_day": "morning",
-                "steps": ["Gentle cleanser", "Vitamin C serum", "Moisturizer", "SPF 30+"],
-                "products": ["CeraVe Foaming Cleanser", "The Ordinary Vitamin C", "Neutrogena Hydro Boost"],
-                "video_url": "https://www.youtube.com/watch?v=skincare1"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Acne-Fighting Routine",
-                "description": "Combat breakouts with targeted treatment",
-                "skin_type": "acne-prone",
-                "time_of_day": "evening",
-                "steps": ["Salicylic acid cleanser", "Niacinamide serum", "Benzoyl peroxide spot treatment", "Light moisturizer"],
-                "products": ["Paula's Choice BHA", "The Ordinary Niacinamide", "La Roche-Posay Effaclar"],
-                "video_url": "https://www.youtube.com/watch?v=skincare2"
-            }
-        ]
-        await db.skincare.insert_many(sample_skincare)
-
-        # Initialize sample meal plans
-        sample_meals = [
-            {
-                "id": str(uuid.uuid4()),
-                "title": "High Protein Power Bowl",
-                "description": "Muscle-building meal with complete nutrition",
-                "diet_type": "high-protein",
-                "calories": 650,
-                "macros": {"protein": 45, "carbs": 35, "fat": 25},
-                "ingredients": ["chicken breast", "quinoa", "black beans", "avocado", "vegetables"],
-                "instructions": ["Grill chicken", "Cook quinoa", "Assemble bowl", "Add dressing"],
-                "prep_time": 25
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "title": "Keto Fat Bomb Salad",
-                "description": "Low-carb, high-fat satisfying meal",
-                "diet_type": "keto",
-                "calories": 580,
-                "macros": {"protein": 25, "carbs": 5, "fat": 70},
-                "ingredients": ["salmon", "avocado", "olive oil", "nuts", "leafy greens"],
-                "instructions": ["Prepare salmon", "Mix salad", "Add healthy fats", "Serve immediately"],
-                "prep_time": 15
-            }
-        ]
-        await db.meals.insert_many(sample_meals)
-
-        # Initialize health condition plans
-        sample_health = [
-            {
-                "id": str(uuid.uuid4()),
-                "condition": "PCOS",
-                "title": "PCOS Management Plan",
-                "description": "Holistic approach to managing PCOS symptoms",
-                "daily_routine": ["30 min moderate exercise", "Balanced low-GI meals", "Stress management", "Quality sleep"],
-                "lifestyle_tips": ["Limit processed foods", "Include omega-3s", "Regular meal timing", "Mindfulness practice"],
-                "video_url": "https://www.youtube.com/watch?v=pcos1"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "condition": "Diabetes",
-                "title": "Diabetes Wellness Plan",
-                "description": "Daily routine for blood sugar management",
-                "daily_routine": ["Check blood glucose", "Balanced meals", "Regular exercise", "Medication adherence"],
-                "lifestyle_tips": ["Carb counting", "Regular doctor visits", "Foot care", "Stay hydrated"],
-                "video_url": "https://www.youtube.com/watch?v=diabetes1"
-            }
-        ]
-        await db.health_conditions.insert_many(sample_health)
+async def ensure_indexes():
+    """Create the indexes the request paths rely on"""
+    await db.grocery_carts.create_index("id", unique=True)
+    await db.grocery_carts.create_index("user_id")
+    await db.personalized_recommendations.create_index([("user_id", 1), ("profile_hash", 1), ("timestamp", -1)])
+    await db.wellness_jobs.create_index("id", unique=True)
+    await db.wellness_jobs.create_index([("status", 1), ("created_at", 1)])
+    await db.wellness_jobs.create_index("created_at", expireAfterSeconds=WELLNESS_JOB_TTL_SECONDS)
+    await db.rate_limits.create_index("expires_at", expireAfterSeconds=0)
+    await db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+    # Lookups by user, newest first, used by auth and the mind-soul endpoints
+    await db.users.create_index("email")
+    await db.users.create_index("id")
+    await db.mood_entries.create_index([("user_id", 1), ("date", -1)])
+    await db.meditation_sessions.create_index([("user_id", 1), ("date", -1)])
+    await db.habit_progress.create_index([("user_id", 1), ("habit_name", 1), ("date", -1)])
+    try:
+        await db.meditation_sessions.create_index([("user_id", 1), ("session_id", 1)], unique=True)
+    except Exception as e:
+        # Duplicates logged before sessions were deduplicated block the unique index
+        logger.warning("Error creating meditation_sessions index: %s", e)
 
 # API Routes
 @api_router.get("/")
@@ -317,6 +406,10 @@ async def root():
     return {"message": "Nutracía AI Wellness API is running"}
 
 # Authentication Routes
+
+# Everything but the password hash
+USER_PUBLIC_PROJECTION = {"password": 0}
+
 @api_router.post("/auth/signup", response_model=AuthResponse)
 async def signup_user(signup_data: SignupRequest):
     """Register a new user with complete profile data"""
@@ -329,7 +422,7 @@ async def signup_user(signup_data: SignupRequest):
             )
         
         # Check if email already exists
-        existing_user = await db.users.find_one({"email": signup_data.email})
+        existing_user = await db.users.find_one({"email": signup_data.email}, {"_id": 1})
         if existing_user:
             return AuthResponse(
                 success=False,
@@ -365,14 +458,13 @@ async def signup_user(signup_data: SignupRequest):
         result = await db.users.insert_one(user_doc)
         
         # Return user data without password
-        user_response = user_doc.copy()
-        user_response.pop("password")
-        user_response["_id"] = str(result.inserted_id)
+        user_doc.pop("password")
+        user_doc["_id"] = str(result.inserted_id)
         
         return AuthResponse(
             success=True,
             message="Registration successful! Welcome to Nutracía!",
-            user=user_response,
+            user=user_doc,
             user_id=user_doc["id"]
         )
         
@@ -402,15 +494,14 @@ async def login_user(login_data: LoginRequest):
             )
         
         # Return user data without password
-        user_response = user.copy()
-        user_response.pop("password")
-        if "_id" in user_response:
-            user_response["_id"] = str(user_response["_id"])
+        user.pop("password")
+        if "_id" in user:
+            user["_id"] = str(user["_id"])
         
         return AuthResponse(
             success=True,
             message="Login successful! Welcome back to Nutracía!",
-            user=user_response,
+            user=user,
             user_id=user.get("id", str(user.get("_id", "")))
         )
         
@@ -425,13 +516,13 @@ async def get_user_profile(user_id: str):
     """Retrieve user profile by ID"""
     try:
         # Try to find by custom id first, then by MongoDB _id
-        user = await db.users.find_one({"id": user_id})
+        user = await db.users.find_one({"id": user_id}, USER_PUBLIC_PROJECTION)
         if not user:
             # Try finding by MongoDB _id if it's a valid ObjectId format
             try:
                 from bson import ObjectId
                 if ObjectId.is_valid(user_id):
-                    user = await db.users.find_one({"_id": ObjectId(user_id)})
+                    user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PUBLIC_PROJECTION)
             except:
                 pass
         
@@ -441,16 +532,13 @@ async def get_user_profile(user_id: str):
                 message="User not found"
             )
         
-        # Return user data without password
-        user_response = user.copy()
-        user_response.pop("password", None)  # Remove password if it exists
-        if "_id" in user_response:
-            user_response["_id"] = str(user_response["_id"])
+        if "_id" in user:
+            user["_id"] = str(user["_id"])
         
         return AuthResponse(
             success=True,
             message="User profile retrieved successfully",
-            user=user_response,
+            user=user,
             user_id=user.get("id", str(user.get("_id", "")))
         )
         
@@ -469,30 +557,79 @@ async def create_user(user_data: UserProfileCreate):
 
 @api_router.get("/users/{user_id}", response_model=UserProfile)
 async def get_user(user_id: str):
-    user = await db.users.find_one({"id": user_id})
+    # Projection drops _id, the password hash and signup-only fields at query time
+    user = await find_model(db.users, UserProfile, {"id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return UserProfile(**user)
+    return model_response(UserProfile, user)
+
+# Catalog reads: the seeded catalogs only change through migrations, so each list is
+# loaded, serialized and compressed once and then served from memory
+from config.settings import CATALOG_PAYLOAD_TTL_SECONDS
+
+CATALOGS = {
+    "workouts": WorkoutPlan,
+    "skincare": SkincareRoutine,
+    "meals": MealPlan,
+    "health_conditions": HealthConditionPlan,
+}
+catalog_payloads = {}  # collection name -> (built_at, PrecompressedPayload)
+catalog_locks = {name: asyncio.Lock() for name in CATALOGS}
+
+async def load_catalog_payload(name: str) -> PrecompressedPayload:
+    # One rebuild per catalog at a time; maximum-effort compression runs off the event loop
+    requested_at = time.monotonic()
+    async with catalog_locks[name]:
+        cached = catalog_payloads.get(name)
+        if cached is not None and cached[0] >= requested_at:
+            return cached[1]  # rebuilt by whoever held the lock
+        model = CATALOGS[name]
+        items = await find_models(db[name], model)
+        payload = await asyncio.to_thread(PrecompressedPayload, type_adapter(List[model]).dump_json(items))
+        catalog_payloads[name] = (time.monotonic(), payload)
+        return payload
+
+async def refresh_catalog_payload(name: str):
+    try:
+        await load_catalog_payload(name)
+    except Exception as e:
+        logger.warning("Error refreshing %s catalog: %s", name, e)
+
+async def catalog_response(request: Request, name: str) -> Response:
+    cached = catalog_payloads.get(name)
+    if cached is None:
+        payload = await load_catalog_payload(name)
+    else:
+        payload = cached[1]
+        # Serve the stale payload and rebuild it once in the background
+        if time.monotonic() - cached[0] >= CATALOG_PAYLOAD_TTL_SECONDS and not catalog_locks[name].locked():
+            spawn_background_task(refresh_catalog_payload(name))
+    return payload.response(request.headers.get("accept-encoding"), request.headers.get("if-none-match"))
+
+@api_router.on_event("startup")
+async def warm_catalog_payloads():
+    """Build the catalog payloads at startup, so the first requests don't pay for it"""
+    for name in CATALOGS:
+        try:
+            await load_catalog_payload(name)
+        except Exception as e:
+            logger.warning("Error preloading %s catalog: %s", name, e)
 
 @api_router.get("/workouts", response_model=List[WorkoutPlan])
-async def get_workouts():
-    workouts = await db.workouts.find().to_list(1000)
-    return [WorkoutPlan(**workout) for workout in workouts]
+async def get_workouts(request: Request):
+    return await catalog_response(request, "workouts")
 
 @api_router.get("/skincare", response_model=List[SkincareRoutine])
-async def get_skincare():
-    routines = await db.skincare.find().to_list(1000)
-    return [SkincareRoutine(**routine) for routine in routines]
+async def get_skincare(request: Request):
+    return await catalog_response(request, "skincare")
 
 @api_router.get("/meals", response_model=List[MealPlan])
-async def get_meals():
-    meals = await db.meals.find().to_list(1000)
-    return [MealPlan(**meal) for meal in meals]
+async def get_meals(request: Request):
+    return await catalog_response(request, "meals")
 
 @api_router.get("/health-conditions", response_model=List[HealthConditionPlan])
-async def get_health_conditions():
-    conditions = await db.health_conditions.find().to_list(1000)
-    return [HealthConditionPlan(**condition) for condition in conditions]
+async def get_health_conditions(request: Request):
+    return await catalog_response(request, "health_conditions")
 
 # Enhanced Health Chatbot Models
 class HealthChatRequest(BaseModel):
@@ -589,7 +726,7 @@ async def health_chat_ai(chat_data: HealthChatRequest):
         )
         
     except Exception as e:
-        print(f"Error in health chat: {str(e)}")
+        logger.exception("Error in health chat: %s", e)
         # Fallback response
         fallback_response = "I'm here to help with your health and wellness journey! I can provide advice on workouts, nutrition, and skincare. What would you like to know?"
         
@@ -934,7 +1071,7 @@ async def analyze_symptoms(request: SymptomCheckRequest):
         )
         
     except Exception as e:
-        print(f"Error in symptom analysis: {str(e)}")
+        logger.exception("Error in symptom analysis: %s", e)
         # Fallback response
         return SymptomCheckResponse(
             analysis_id=str(uuid.uuid4()),
@@ -1118,25 +1255,31 @@ def generate_follow_up_questions(symptoms: List[str], body_parts: List[str]) ->
     return questions[:4]  # Return top 4 questions
 
 # Enhanced Grocery Agent - AI-Powered Shopping Assistant
-import sys
-import os
-from typing import List
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from config.settings import GROCERY_MAX_CONCURRENT, GROCERY_MAX_QUEUE, GROCERY_PREFERRED_PROVIDER
 
 try:
-    from config.settings import GEMINI_API_KEY
     from modules.user_preferences import get_user_preferences
     from modules.prompt_builder import build_recommendation_prompt
-    from langchain_google_genai import ChatGoogleGenerativeAI
 except ImportError:
     # Fallback if grocery agent modules are not available
-    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+    pass
+
+from modules.pricing import PriceParseError, annotate_price, paise_to_amount, parse_price
+
+# Upper bound on line items accepted by the bulk cart endpoint
+MAX_BULK_CART_ITEMS = 500
+# Upper bound on the quantity of a single cart line
+MAX_LINE_QUANTITY = 99
+
+grocery_limiter = get_limiter("grocery_recommendations", GROCERY_MAX_CONCURRENT, GROCERY_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_SECONDS)
 
 class ShoppingRequest(BaseModel):
     query: str
     budget: Optional[int] = 500
     preferred_brands: Optional[List[str]] = ["MuscleBlaze", "Organic India"]
     diet: Optional[str] = "high protein"
+    sort_by: Optional[Literal["price_asc", "price_desc"]] = None
+    within_budget: bool = False  # drop products priced above the budget
 
 class ProductRecommendation(BaseModel):
     name: str
@@ -1146,9 +1289,122 @@ class ProductRecommendation(BaseModel):
     rating: str
     platform: str
     selected: bool = False
+    price_paise: Optional[int] = None  # normalized integer price, parsed once
+    currency: str = "INR"
+
+class CartItem(BaseModel):
+    product_id: Optional[str] = None  # derived from platform + name when omitted
+    name: str
+    price: str
+    price_paise: Optional[int] = None  # derived from price
+    currency: Optional[str] = None  # used when the price has no currency marker
+    quantity: int = Field(1, ge=1, le=MAX_LINE_QUANTITY)
+    platform: Optional[str] = None
+    description: Optional[str] = None
+    protein: Optional[str] = None
+    rating: Optional[str] = None
+
+    @model_validator(mode="after")
+    def normalize_price(self):
+        # Totals are computed from the parsed price, never from a client-supplied price_paise
+        self.price_paise, self.currency = parse_price(self.price, self.currency or "INR")
+        return self
+
+class BulkCartRequest(BaseModel):
+    items: List[CartItem] = Field(..., min_length=1, max_length=MAX_BULK_CART_ITEMS)
+
+class CartCreateRequest(BaseModel):
+    user_id: Optional[str] = None
+    currency: str = "INR"
+    items: List[CartItem] = Field([], max_length=MAX_BULK_CART_ITEMS)
+
+class CartQuantityUpdate(BaseModel):
+    quantity: int = Field(..., ge=0, le=MAX_LINE_QUANTITY)  # 0 removes the item
+
+def apply_price_filters(recommendations: List[dict], budget: Optional[int], within_budget: bool = False, sort_by: Optional[str] = None) -> List[dict]:
+    """Annotate products with numeric prices, then filter by budget and sort on those numbers"""
+    products = [annotate_price(product) for product in recommendations]
+
+    if within_budget and budget is not None:
+        budget_paise = budget * 100
+        products = [p for p in products if p["price_paise"] is not None and p["price_paise"] <= budget_paise]
+
+    if sort_by in ("price_asc", "price_desc"):
+        # Unparseable prices always sort last
+        missing = [p for p in products if p["price_paise"] is None]
+        priced = [p for p in products if p["price_paise"] is not None]
+        priced.sort(key=lambda p: p["price_paise"], reverse=sort_by == "price_desc")
+        products = priced + missing
+
+    return products
+
+def summarize_cart(items: List[dict]) -> dict:
+    """Total a list of cart items on integer paise, parsing only items without a normalized price"""
+    total_paise = 0
+    item_count = 0
+    currency = None
+
+    for item in items:
+        price_paise = item.get('price_paise')
+        item_currency = item.get('currency')
+        if price_paise is None:
+            price_paise, parsed_currency = parse_price(item.get('price', '₹0'))
+            item_currency = item_currency or parsed_currency
+        item_currency = item_currency or "INR"
+
+        if currency is None:
+            currency = item_currency
+        elif item_currency != currency:
+            raise PriceParseError(f"Mixed currencies in cart: {currency} and {item_currency}")
+
+        quantity = item.get('quantity', 1)
+        total_paise += price_paise * quantity
+        item_count += quantity
+
+    return {
+        "total_cost": paise_to_amount(total_paise),
+        "total_cost_paise": total_paise,
+        "currency": currency or "INR",
+        "item_count": item_count
+    }
+
+def grocery_fallback_response(request: ShoppingRequest, status: str = "fallback") -> dict:
+    """Static recommendations used when the AI path fails or the endpoint is overloaded"""
+    return {
+        "status": status,
+        "recommendations": apply_price_filters([
+            {
+                "name": "MuscleBlaze Whey Protein",
+                "price": "₹1,999",
+                "description": "High-quality whey protein for muscle building",
+                "protein": "25g per serving",
+                "rating": "4.4/5",
+                "platform": "Amazon Fresh",
+                "selected": False
+            },
+            {
+                "name": "Organic Trail Mix",
+                "price": "₹299",
+                "description": "Healthy snack mix with nuts and dried fruits",
+                "protein": "8g per serving",
+                "rating": "4.2/5",
+                "platform": "Flipkart Minutes",
+                "selected": False
+            }
+        ], request.budget, within_budget=request.within_budget, sort_by=request.sort_by)
+    }
 
 @api_router.post("/grocery/recommendations")
-async def get_grocery_recommendations(request: ShoppingRequest):
+async def get_grocery_recommendations(request: ShoppingRequest, http_request: Request):
+    """AI-powered grocery recommendations, shed to the static list when too many are in flight"""
+    await enforce_rate_limit("grocery_recommendations", http_request)
+    try:
+        async with grocery_limiter.admit():
+            return await generate_grocery_recommendations(request)
+    except OverloadedError:
+        return grocery_fallback_response(request, status="degraded")
+
+async def generate_grocery_recommendations(request: ShoppingRequest):
     """AI-powered grocery recommendations using Google Gemini"""
     try:
         try:
@@ -1168,18 +1424,18 @@ async def get_grocery_recommendations(request: ShoppingRequest):
                 request.preferred_brands
             )
             
-            # Initialize AI
-            llm = ChatGoogleGenerativeAI(
-                model='gemini-2.0-flash-exp',
-                api_key=GEMINI_API_KEY
+            # Get AI recommendations; open circuits on every provider skip straight to the fallback products
+            result = await llm_router.complete(
+                [{"role": "user", "content": prompt}],
+                preferred=GROCERY_PREFERRED_PROVIDER,
+                category="grocery"
             )
-            
-            # Get AI recommendations
-            response = await llm.ainvoke(prompt)
-            ai_text = response.content
+            ai_text = result.text
         except ImportError:
             # Fallback without external modules
             ai_text = f"AI recommendations for: {request.query} within budget ₹{request.budget}"
+        except CircuitOpenError:
+            ai_text = ""
         
         # Parse AI response into structured recommendations
         recommendations = []
@@ -1218,7 +1474,7 @@ async def get_grocery_recommendations(request: ShoppingRequest):
                         "selected": False
                     })
             except Exception as parse_error:
-                print(f"Error parsing product {i}: {parse_error}")
+                logger.warning("Error parsing product %s: %s", i, parse_error)
                 continue
         
         # Fallback if parsing failed - create dynamic recommendations based on query
@@ -1347,248 +1603,688 @@ async def get_grocery_recommendations(request: ShoppingRequest):
                     }
                 ]
         
+        recommendations = apply_price_filters(
+            recommendations[:5],  # Limit to 5 products
+            request.budget,
+            within_budget=request.within_budget,
+            sort_by=request.sort_by
+        )
+        
         return {
             "status": "success",
             "user_preferences": user_prefs,
             "ai_response": ai_text,
-            "recommendations": recommendations[:5],  # Limit to 5 products
+            "recommendations": recommendations,
             "total_budget": request.budget
         }
         
     except Exception as e:
-        print(f"Error in get_grocery_recommendations: {str(e)}")
+        logger.exception("Error in get_grocery_recommendations: %s", e)
         # Return fallback recommendations if AI fails
-        return {
-            "status": "fallback",
-            "recommendations": [
-                {
-                    "name": "MuscleBlaze Whey Protein",
-                    "price": "₹1,999",
-                    "description": "High-quality whey protein for muscle building",
-                    "protein": "25g per serving",
-                    "rating": "4.4/5",
-                    "platform": "Amazon Fresh",
-                    "selected": False
-                },
-                {
-                    "name": "Organic Trail Mix",
-                    "price": "₹299",
-                    "description": "Healthy snack mix with nuts and dried fruits",
-                    "protein": "8g per serving",
-                    "rating": "4.2/5",
-                    "platform": "Flipkart Minutes",
-                    "selected": False
-                }
-            ]
-        }
+        return grocery_fallback_response(request)
 
 @api_router.post("/grocery/create-cart")
 async def create_grocery_cart(selected_products: List[dict]):
     """Create cart with selected products"""
     try:
-        total_cost = 0
-        cart_items = []
-        
-        for product in selected_products:
-            if product.get('selected', False):
-                # Clean price string and convert to number
-                price_str = product.get('price', '₹0')
-                price_num = int(price_str.replace('₹', '').replace(',', ''))
-                total_cost += price_num
-                cart_items.append(product)
+        # Keyed by position so validation errors point at the product as it was posted
+        selected = {index: product for index, product in enumerate(selected_products) if product.get('selected', False)}
+        cart_items = [item.dict() for item in type_adapter(Dict[int, CartItem]).validate_python(selected).values()]
         
         cart_data = {
             "timestamp": datetime.utcnow().isoformat(),
             "cart_items": cart_items,
-            "total_cost": total_cost,
-            "item_count": len(cart_items),
+            **summarize_cart(cart_items),
             "status": "cart_created"
         }
         
         return cart_data
         
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)])
+    except PriceParseError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid cart item: {str(e)}")
     except Exception as e:
-        print(f"Error creating cart: {str(e)}")
+        logger.exception("Error creating cart: %s", e)
         raise HTTPException(status_code=500, detail=f"Error creating cart: {str(e)}")
 
-# Personalized Wellness Recommendation System
-@api_router.post("/wellness/personalized-recommendations", response_model=PersonalizedWellnessResponse)
-async def generate_personalized_wellness_recommendations(request: PersonalizedWellnessRequest):
-    """Generate AI-powered personalized recommendations for all wellness categories"""
+@api_router.post("/grocery/create-cart/bulk")
+async def create_grocery_cart_bulk(cart_request: BulkCartRequest):
+    """Create a cart from a large, validated selection of products with quantities"""
     try:
-        # Prepare user profile summary
-        profile_summary = f"""
-        Weight: {request.weight}
-        Allergies: {request.allergies}
-        Wellness Goals: {', '.join(request.wellness_goals)}
-        Health Conditions: {', '.join(request.health_conditions)}
-        Age: {request.age}
-        Gender: {request.gender}
-        Fitness Level: {request.fitness_level}
-        """
-        
-        # Generate recommendations for all categories
-        recommendations = {}
-        
-        # 1. WORKOUT RECOMMENDATIONS
-        workout_prompt = f"""
-        Based on user profile: {profile_summary}
-        
-        Generate 3 personalized workout recommendations in this EXACT JSON format (array of objects):
-        [
-          {{
-            "title": "Progressive Strength Building",
-            "description": "Build lean muscle mass and increase strength with progressive overload training designed for {request.fitness_level} level.",
-            "duration": "45-60 min",
-            "level": "Beginner to Advanced",
-            "requirements": ["Dumbbells or resistance bands", "Bench or sturdy chair", "Proper form guidance"],
-            "steps": ["5 min dynamic warm-up", "Compound movements: 3 sets x 8-12 reps", "Progressive overload each week", "Cool down stretches: 5 min"],
-            "youtube_video": "https://www.youtube.com/results?search_query=strength+training+{request.fitness_level}+workout",
-            "product_links": ["https://amazon.com/s?k=adjustable+dumbbells+home+gym", "https://flipkart.com/search?q=resistance+bands+fitness"],
-            "image_url": "workout_strength_building.jpg"
-          }}
-        ]
-        
-        IMPORTANT: Return ONLY the JSON array, no other text.
-        """
-        
-        # 2. DIET RECOMMENDATIONS  
-        diet_prompt = f"""
-        Based on user profile: {profile_summary}
-        AVOID these allergies: {request.allergies}
-        
-        Generate 3 personalized diet recommendations in this EXACT JSON format (array of objects):
-        [
-          {{
-            "title": "High Protein Power Bowl",
-            "description": "Muscle-building meal with complete nutrition designed for {request.weight} weight goals, avoiding {request.allergies}.",
-            "duration": "25 min prep",
-            "level": "Easy to Prepare",
-            "requirements": ["Fresh ingredients (avoiding {request.allergies})", "Cooking utensils", "15-20 minutes prep time"],
-            "steps": ["Prep vegetables: 5 min", "Cook protein source: 10 min", "Assemble bowl with healthy fats", "Add seasonings and serve"],
-            "youtube_video": "https://www.youtube.com/results?search_query=healthy+protein+bowl+recipe+{'+'.join(request.wellness_goals)}",
-            "product_links": ["https://amazon.com/s?k=organic+vegetables+fresh", "https://flipkart.com/search?q=lean+protein+sources"],
-            "image_url": "diet_power_bowl.jpg"
-          }}
-        ]
-        
-        IMPORTANT: Return ONLY the JSON array, no other text.
-        """
-        
-        # 3. SKINCARE RECOMMENDATIONS
-        skincare_prompt = f"""
-        Based on user profile: {profile_summary}
-        
-        Generate 3 personalized skincare recommendations in this EXACT JSON format (array of objects):
-        [
-          {{
-            "title": "Morning Glow Routine",
-            "description": "Start your day with radiant skin using this science-backed routine tailored for {request.age} year old {request.gender}.",
-            "duration": "10-15 min",
-            "level": "Suitable for All Skin Types",
-            "requirements": ["Gentle cleanser", "Vitamin C serum", "Moisturizer with SPF", "Clean hands"],
-            "steps": ["Cleanse with lukewarm water: 2 min", "Apply vitamin C serum: 1 min", "Moisturize evenly: 2 min", "Apply SPF 30+ sunscreen: 2 min"],
-            "youtube_video": "https://www.youtube.com/results?search_query=morning+skincare+routine+{request.gender}+{request.age}",
-            "product_links": ["https://amazon.com/s?k=morning+skincare+routine+products", "https://flipkart.com/search?q=sunscreen+spf+50+daily"],
-            "image_url": "skincare_morning_routine.jpg"
-          }}
-        ]
-        
-        IMPORTANT: Return ONLY the JSON array, no other text.
-        """
-        
-        # 4. HEALTH RECOMMENDATIONS
-        health_conditions_str = ', '.join(request.health_conditions) if request.health_conditions else 'general wellness'
-        health_prompt = f"""
-        Based on user profile: {profile_summary}
-        Focus on: {health_conditions_str}
-        
-        Generate 3 personalized health management recommendations in this EXACT JSON format (array of objects):
-        [
-          {{
-            "title": "Daily Wellness Management",
-            "description": "Holistic approach to managing {health_conditions_str} while achieving your wellness goals.",
-            "duration": "Ongoing Daily Routine",
-            "level": "Personalized for Your Conditions",
-            "requirements": ["Daily commitment", "Health monitoring tools", "Professional guidance when needed"],
-            "steps": ["Morning health check: 5 min", "Medication/supplement routine if needed", "Physical activity as recommended", "Evening reflection and planning"],
-            "youtube_video": "https://www.youtube.com/results?search_query=health+management+{health_conditions_str.replace(' ', '+')}+wellness",
-            "product_links": ["https://amazon.com/s?k=health+monitoring+devices+wellness", "https://flipkart.com/search?q=health+supplements+wellness"],
-            "image_url": "health_wellness_management.jpg",
-            "motivational_quote": "Every step you take towards better health is a victory. BELIEVE NUTRACIAA YOU WILL HEAL SOON! 💪✨"
-          }}
-        ]
-        
-        IMPORTANT: Return ONLY the JSON array, no other text.
-        """
+        cart_items = [item.dict() for item in cart_request.items]
         
-        # Generate recommendations using OpenAI
-        categories = {
-            'workout': workout_prompt,
-            'diet': diet_prompt, 
-            'skincare': skincare_prompt,
-            'health': health_prompt
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "cart_items": cart_items,
+            **summarize_cart(cart_items),
+            "status": "cart_created"
         }
         
-        for category, prompt in categories.items():
+    except PriceParseError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid cart item: {str(e)}")
+
+# Persistent carts: line items are edited in place and the totals are kept in
+# step with $inc, so an edit never re-sends or re-sums the whole cart.
+MAX_CART_UPDATE_RETRIES = 3
+
+def build_cart_line(item: CartItem) -> dict:
+    """Normalize a cart item into the stored line format"""
+    line = item.dict()
+    if not line['product_id']:
+        line['product_id'] = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{line['platform'] or ''}:{line['name']}"))
+    return line
+
+def cart_response(cart: dict) -> dict:
+    """Add the rupee total to a stored cart document"""
+    cart["total_cost"] = paise_to_amount(cart["total_cost_paise"])
+    return cart
+
+async def get_cart_or_404(cart_id: str) -> dict:
+    cart = await db.grocery_carts.find_one({"id": cart_id}, {"_id": 0})
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    return cart
+
+async def add_line_to_cart(cart_id: str, line: dict) -> dict:
+    """Add a line item, bumping the quantity if the product is already in the cart"""
+    for _ in range(MAX_CART_UPDATE_RETRIES):
+        increment = {
+            "total_cost_paise": line['price_paise'] * line['quantity'],
+            "item_count": line['quantity']
+        }
+        # Existing line at the same price, with room for the extra quantity: bump it
+        cart = await db.grocery_carts.find_one_and_update(
+            {
+                "id": cart_id,
+                "currency": line['currency'],
+                "items": {"$elemMatch": {
+                    "product_id": line['product_id'],
+                    "price_paise": line['price_paise'],
+                    "quantity": {"$lte": MAX_LINE_QUANTITY - line['quantity']}
+                }}
+            },
+            {
+                "$inc": {"items.$.quantity": line['quantity'], **increment},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if cart:
+            return cart
+
+        # New product: append the line
+        cart = await db.grocery_carts.find_one_and_update(
+            {"id": cart_id, "currency": line['currency'], "items.product_id": {"$ne": line['product_id']}},
+            {
+                "$push": {"items": line},
+                "$inc": increment,
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if cart:
+            return cart
+
+        cart = await get_cart_or_404(cart_id)
+        if cart["currency"] != line['currency']:
+            raise HTTPException(status_code=422, detail=f"Cart currency is {cart['currency']}, item is priced in {line['currency']}")
+        existing = next((i for i in cart["items"] if i["product_id"] == line['product_id']), None)
+        if existing and existing["price_paise"] != line['price_paise']:
+            raise HTTPException(status_code=409, detail="Product is already in the cart at a different price")
+        if existing and existing["quantity"] + line['quantity'] > MAX_LINE_QUANTITY:
+            raise HTTPException(status_code=422, detail=f"Quantity of {line['name']} would exceed {MAX_LINE_QUANTITY}")
+        # Otherwise another request added or removed the line concurrently; retry
+
+    raise HTTPException(status_code=409, detail="Cart was modified concurrently, please retry")
+
+async def set_line_quantity(cart_id: str, product_id: str, quantity: int) -> dict:
+    """Change a line's quantity (0 removes it) with an optimistic check on the current quantity"""
+    for _ in range(MAX_CART_UPDATE_RETRIES):
+        cart = await db.grocery_carts.find_one(
+            {"id": cart_id, "items.product_id": product_id},
+            {"_id": 0, "items": {"$elemMatch": {"product_id": product_id}}}
+        )
+        if not cart:
+            await get_cart_or_404(cart_id)
+            raise HTTPException(status_code=404, detail="Item not in cart")
+
+        line = cart["items"][0]
+        delta = quantity - line["quantity"]
+        update = {
+            "$inc": {"total_cost_paise": line["price_paise"] * delta, "item_count": delta},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+        if quantity == 0:
+            update["$pull"] = {"items": {"product_id": product_id}}
+        else:
+            update["$set"]["items.$.quantity"] = quantity
+
+        cart = await db.grocery_carts.find_one_and_update(
+            # Price too: the $inc above was computed from the line as read
+            {"id": cart_id, "items": {"$elemMatch": {"product_id": product_id, "quantity": line["quantity"], "price_paise": line["price_paise"]}}},
+            update,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if cart:
+            return cart
+
+    raise HTTPException(status_code=409, detail="Cart was modified concurrently, please retry")
+
+@api_router.post("/grocery/carts")
+async def create_persistent_cart(cart_request: CartCreateRequest):
+    """Create a server-side cart that can be edited incrementally and shared across devices"""
+    lines = {}
+    for item in cart_request.items:
+        line = build_cart_line(item)
+        if line['currency'] != cart_request.currency:
+            raise HTTPException(status_code=422, detail=f"Cart currency is {cart_request.currency}, item is priced in {line['currency']}")
+        existing = lines.get(line['product_id'])
+        if existing:
+            if existing['price_paise'] != line['price_paise']:
+                raise HTTPException(status_code=409, detail="Product is listed more than once at different prices")
+            if existing['quantity'] + line['quantity'] > MAX_LINE_QUANTITY:
+                raise HTTPException(status_code=422, detail=f"Quantity of {line['name']} would exceed {MAX_LINE_QUANTITY}")
+            existing['quantity'] += line['quantity']
+        else:
+            lines[line['product_id']] = line
+    
+    items = list(lines.values())
+    now = datetime.utcnow()
+    cart_doc = {
+        "id": str(uuid.uuid4()),
+        "user_id": cart_request.user_id,
+        "currency": cart_request.currency,
+        "items": items,
+        "total_cost_paise": sum(line['price_paise'] * line['quantity'] for line in items),
+        "item_count": sum(line['quantity'] for line in items),
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.grocery_carts.insert_one(cart_doc)
+    cart_doc.pop("_id", None)
+    
+    return cart_response(cart_doc)
+
+@api_router.get("/grocery/carts/{cart_id}")
+async def get_persistent_cart(cart_id: str):
+    """Fetch a stored cart with its running totals"""
+    return cart_response(await get_cart_or_404(cart_id))
+
+@api_router.post("/grocery/carts/{cart_id}/items")
+async def add_cart_item(cart_id: str, item: CartItem):
+    """Add a product to a stored cart"""
+    return cart_response(await add_line_to_cart(cart_id, build_cart_line(item)))
+
+@api_router.patch("/grocery/carts/{cart_id}/items/{product_id}")
+async def update_cart_item_quantity(cart_id: str, product_id: str, update: CartQuantityUpdate):
+    """Set the quantity of a product in a stored cart"""
+    return cart_response(await set_line_quantity(cart_id, product_id, update.quantity))
+
+@api_router.delete("/grocery/carts/{cart_id}/items/{product_id}")
+async def remove_cart_item(cart_id: str, product_id: str):
+    """Remove a product from a stored cart"""
+    return cart_response(await set_line_quantity(cart_id, product_id, 0))
+
+# Personalized Wellness Recommendation System
+from config.settings import (
+    WELLNESS_CACHE_MAX_STALE_SECONDS,
+    WELLNESS_CACHE_TTL_SECONDS,
+    WELLNESS_GENERATION_MODE,
+    WELLNESS_JOB_CLAIM_INTERVAL_SECONDS,
+    WELLNESS_JOB_CONCURRENCY,
+    WELLNESS_JOB_LEASE_SECONDS,
+    WELLNESS_JOB_MAX_ATTEMPTS,
+    WELLNESS_JOB_POLL_INTERVAL_SECONDS,
+    WELLNESS_JOB_QUEUE_SIZE,
+    WELLNESS_JOB_STREAM_TIMEOUT_SECONDS,
+    WELLNESS_JOB_TTL_SECONDS,
+    WELLNESS_MAX_CONCURRENT,
+    WELLNESS_MAX_QUEUE,
+    WELLNESS_MAX_COMPLETION_TOKENS,
+    WELLNESS_PREFERRED_PROVIDER,
+    WELLNESS_SINGLE_CALL_RETRIES,
+    WELLNESS_TOKEN_BUDGET,
+)
+from modules.wellness_prompts import (
+    WELLNESS_PROMPT_VERSION,
+    TokenBudget,
+    build_category_prompt,
+    build_combined_prompt,
+    build_messages,
+    build_profile_summary,
+    build_shared_prefix,
+    count_message_tokens,
+)
+
+WELLNESS_CATEGORIES = ['workout', 'diet', 'skincare', 'health']
+
+wellness_limiter = get_limiter("wellness_recommendations", WELLNESS_MAX_CONCURRENT, WELLNESS_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_SECONDS)
+
+async def request_wellness_completion(messages: List[dict], category: str, budget: TokenBudget, stats: dict, max_completion_tokens: Optional[int] = None) -> str:
+    """Send one wellness prompt within the request's token budget and return the raw model text"""
+    prompt_tokens = count_message_tokens(messages, OPENAI_MODEL)
+    max_tokens = budget.reserve(prompt_tokens, max_completion_tokens=max_completion_tokens)
+    if max_tokens is None:
+        raise RuntimeError(f"token budget exhausted: prompt needs {prompt_tokens}, {budget.remaining} left")
+    
+    stats["llm_calls"] += 1
+    stats["prompt_tokens"] += prompt_tokens
+    
+    def reserve_hedge() -> bool:
+        # A hedged duplicate costs a whole second call; send it only if the budget covers that.
+        # Its reservation is kept: the losing call is cancelled and its usage never reported.
+        if budget.reserve(prompt_tokens, min_completion_tokens=max_tokens, max_completion_tokens=max_tokens) is None:
+            return False
+        stats["llm_calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        return True
+    
+    # Open circuits on every provider raise CircuitOpenError and the caller falls back immediately
+    result = await llm_router.complete(
+        messages,
+        max_tokens=max_tokens,
+        temperature=0.7,
+        preferred=WELLNESS_PREFERRED_PROVIDER,
+        category=category,
+        on_hedge=reserve_hedge
+    )
+    budget.settle(max_tokens, result.completion_tokens)
+    stats["completion_tokens"] += result.completion_tokens or 0
+    stats["providers"].append(result.provider)
+    
+    return result.text
+
+async def generate_fanout_recommendations(request: PersonalizedWellnessRequest, shared_prefix: str, budget: TokenBudget, stats: dict) -> Dict[str, List[WellnessRecommendation]]:
+    """One LLM call per category"""
+    recommendations = {}
+    for category in WELLNESS_CATEGORIES:
+        try:
+            with tracing.start_span("wellness.category", **{"wellness.category": category}):
+                messages = build_messages(shared_prefix, build_category_prompt(category, request))
+                ai_response = await request_wellness_completion(messages, category, budget, stats)
+                recommendations[category] = validate_wellness_recommendations(category, parse_json_payload(ai_response))
+        except Exception as e:
+            logger.warning("Error generating %s recommendations: %s", category, e)
+            # Fallback recommendations
+            recommendations[category] = get_fallback_recommendations(category, request)
+            stats["fallback_categories"].append(category)
+    return recommendations
+
+async def generate_single_call_recommendations(request: PersonalizedWellnessRequest, shared_prefix: str, budget: TokenBudget, stats: dict) -> Dict[str, List[WellnessRecommendation]]:
+    """All categories in one structured response; only categories that fail validation are re-requested"""
+    recommendations = {}
+    pending = list(WELLNESS_CATEGORIES)
+    
+    for attempt in range(1 + WELLNESS_SINGLE_CALL_RETRIES):
+        try:
+            messages = build_messages(shared_prefix, build_combined_prompt(pending, request))
+            ai_response = await request_wellness_completion(
+                messages, "combined", budget, stats,
+                max_completion_tokens=WELLNESS_MAX_COMPLETION_TOKENS * len(pending)
+            )
+            payload = parse_json_payload(ai_response)
+            if not isinstance(payload, dict):
+                raise ValueError("expected a JSON object keyed by category")
+        except Exception as e:
+            logger.warning("Error generating combined recommendations (attempt %s): %s", attempt + 1, e)
+            payload = {}
+        
+        # Validate each category on its own so one bad section doesn't discard the rest
+        failed = []
+        for category in pending:
             try:
-                response = openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a professional wellness coach. Return ONLY valid JSON arrays as requested, no additional text or formatting."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=1500,
-                    temperature=0.7
-                )
-                
-                # Parse the response
-                ai_response = response.choices[0].message.content.strip()
-                
-                # Clean the response to ensure it's valid JSON
-                ai_response = ai_response.replace('```json', '').replace('```', '').strip()
-                
-                # Parse JSON response
-                category_recommendations = json.loads(ai_response)
-                
-                # Convert to WellnessRecommendation objects
-                recommendations[category] = []
-                for rec_data in category_recommendations:
-                    rec_data['category'] = category
-                    recommendation = WellnessRecommendation(**rec_data)
-                    recommendations[category].append(recommendation)
-                    
+                recommendations[category] = validate_wellness_recommendations(category, payload.get(category))
             except Exception as e:
-                print(f"Error generating {category} recommendations: {str(e)}")
-                # Fallback recommendations
-                recommendations[category] = get_fallback_recommendations(category, request)
-        
-        # Store recommendations in database for future reference
-        recommendation_doc = {
-            "user_id": request.user_id,
-            "timestamp": datetime.utcnow(),
-            "user_profile": profile_summary,
-            "recommendations": {
-                category: [rec.dict() for rec in recs] 
-                for category, recs in recommendations.items()
-            }
+                logger.warning("Invalid %s recommendations in combined response: %s", category, e)
+                failed.append(category)
+        pending = failed
+        if not pending:
+            break
+    
+    for category in pending:
+        recommendations[category] = get_fallback_recommendations(category, request)
+        stats["fallback_categories"].append(category)
+    
+    # Keep the response ordered like the fan-out mode
+    return {category: recommendations[category] for category in WELLNESS_CATEGORIES}
+
+async def generate_wellness_recommendations(request: PersonalizedWellnessRequest):
+    """Generate recommendations for every category using the configured generation mode"""
+    profile_summary = build_profile_summary(request)
+    
+    # One shared system prefix per request; each call only appends a short instruction
+    shared_prefix = build_shared_prefix(profile_summary)
+    budget = TokenBudget(WELLNESS_TOKEN_BUDGET, WELLNESS_MAX_COMPLETION_TOKENS)
+    stats = {"mode": WELLNESS_GENERATION_MODE, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "providers": [], "fallback_categories": []}
+    
+    started = time.perf_counter()
+    with tracing.start_span("wellness.generate", **{"wellness.mode": WELLNESS_GENERATION_MODE}) as span:
+        if WELLNESS_GENERATION_MODE == "single":
+            recommendations = await generate_single_call_recommendations(request, shared_prefix, budget, stats)
+        else:
+            recommendations = await generate_fanout_recommendations(request, shared_prefix, budget, stats)
+        span.set_attribute("llm.calls", stats["llm_calls"])
+        span.set_attribute("llm.prompt_tokens", stats["prompt_tokens"])
+        span.set_attribute("llm.completion_tokens", stats["completion_tokens"])
+        span.set_attribute("wellness.fallback_categories", ",".join(stats["fallback_categories"]))
+    stats["latency_ms"] = round((time.perf_counter() - started) * 1000)
+    
+    return profile_summary, recommendations, stats
+
+def compute_profile_hash(request: PersonalizedWellnessRequest) -> str:
+    """Hash the profile fields that shape the recommendations (everything but user_id)"""
+    profile = request.dict(exclude={"user_id"})
+    profile["wellness_goals"] = sorted(profile["wellness_goals"])
+    profile["health_conditions"] = sorted(profile["health_conditions"])
+    profile["prompt_version"] = WELLNESS_PROMPT_VERSION
+    return hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest()
+
+async def store_wellness_recommendations(request: PersonalizedWellnessRequest, profile_hash: str, profile_summary: str, recommendations: Dict[str, List[WellnessRecommendation]], generation_stats: dict):
+    """Store recommendations in database for future reference and cache lookups; returns the document id"""
+    recommendation_doc = {
+        "user_id": request.user_id,
+        # Results containing fallbacks (e.g. during an upstream outage) are kept out of the cache
+        "profile_hash": None if generation_stats["fallback_categories"] else profile_hash,
+        "timestamp": datetime.utcnow(),
+        "user_profile": profile_summary,
+        "generation_stats": generation_stats,
+        "recommendations": {
+            category: [rec.dict() for rec in recs] 
+            for category, recs in recommendations.items()
         }
-        await db.personalized_recommendations.insert_one(recommendation_doc)
+    }
+    result = await db.personalized_recommendations.insert_one(recommendation_doc)
+    return result.inserted_id
+
+async def find_cached_wellness_recommendations(user_id: str, profile_hash: str) -> Optional[dict]:
+    """Latest stored recommendations for this user and profile, if any"""
+    return await db.personalized_recommendations.find_one(
+        {"user_id": user_id, "profile_hash": profile_hash},
+        {"timestamp": 1, "recommendations": 1},
+        sort=[("timestamp", -1)]
+    )
+
+# Profile hashes currently being regenerated in the background, so a burst of
+# stale hits triggers a single regeneration
+_revalidating_profiles = set()
+_background_tasks = set()
+
+def spawn_background_task(coro):
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def revalidate_wellness_recommendations(request: PersonalizedWellnessRequest, profile_hash: str):
+    """Regenerate stale cached recommendations without blocking the caller"""
+    key = (request.user_id, profile_hash)
+    if key in _revalidating_profiles:
+        return
+    _revalidating_profiles.add(key)
+    try:
+        async with wellness_limiter.admit():
+            profile_summary, recommendations, generation_stats = await generate_wellness_recommendations(request)
+        await store_wellness_recommendations(request, profile_hash, profile_summary, recommendations, generation_stats)
+    except OverloadedError:
+        # Under load the stale copy keeps being served; the next hit retries
+        pass
+    except Exception as e:
+        logger.exception("Error revalidating wellness recommendations: %s", e)
+    finally:
+        _revalidating_profiles.discard(key)
+
+async def get_or_generate_wellness_recommendations(request: PersonalizedWellnessRequest, limiter: Optional[AdmissionLimiter] = None):
+    """Return (recommendation_id, recommendations, cached), serving stored results while the profile is unchanged.
+
+    With a limiter, generation is subject to admission control and raises OverloadedError when shed.
+    """
+    profile_hash = compute_profile_hash(request)
+    
+    # Fresh results are served as-is, stale ones immediately while a background task regenerates them
+    cached = await find_cached_wellness_recommendations(request.user_id, profile_hash)
+    if cached:
+        age_seconds = (datetime.utcnow() - cached["timestamp"]).total_seconds()
+        if age_seconds < WELLNESS_CACHE_MAX_STALE_SECONDS:
+            if age_seconds >= WELLNESS_CACHE_TTL_SECONDS:
+                cache_requests.inc(cache="wellness_recommendations", result="stale")
+                spawn_background_task(revalidate_wellness_recommendations(request, profile_hash))
+            else:
+                cache_requests.inc(cache="wellness_recommendations", result="hit")
+            return cached["_id"], cached["recommendations"], True
+    
+    cache_requests.inc(cache="wellness_recommendations", result="miss")
+    if limiter is None:
+        profile_summary, recommendations, generation_stats = await generate_wellness_recommendations(request)
+    else:
+        async with limiter.admit():
+            profile_summary, recommendations, generation_stats = await generate_wellness_recommendations(request)
+    recommendation_id = await store_wellness_recommendations(request, profile_hash, profile_summary, recommendations, generation_stats)
+    return recommendation_id, recommendations, False
+
+async def degraded_wellness_recommendations(request: PersonalizedWellnessRequest) -> Dict[str, List[WellnessRecommendation]]:
+    """The user's most recent stored recommendations regardless of age or profile, else the static fallbacks"""
+    latest = await db.personalized_recommendations.find_one(
+        {"user_id": request.user_id},
+        {"_id": 0, "recommendations": 1},
+        sort=[("timestamp", -1)]
+    )
+    if latest and latest.get("recommendations"):
+        return latest["recommendations"]
+    return {category: get_fallback_recommendations(category, request) for category in WELLNESS_CATEGORIES}
+
+@api_router.post("/wellness/personalized-recommendations", response_model=PersonalizedWellnessResponse)
+async def generate_personalized_wellness_recommendations(request: PersonalizedWellnessRequest, http_request: Request):
+    """Generate AI-powered personalized recommendations for all wellness categories"""
+    await enforce_rate_limit("wellness_recommendations", http_request)
+    try:
+        _, recommendations, cached = await get_or_generate_wellness_recommendations(request, limiter=wellness_limiter)
         
         return PersonalizedWellnessResponse(
             success=True,
             message="Personalized wellness recommendations generated successfully!",
-            recommendations=recommendations
+            recommendations=recommendations,
+            cached=cached
+        )
+        
+    except OverloadedError:
+        return PersonalizedWellnessResponse(
+            success=True,
+            message="We're experiencing high demand, showing your most recent recommendations.",
+            recommendations=await degraded_wellness_recommendations(request),
+            cached=False,
+            degraded=True
         )
         
     except Exception as e:
-        print(f"Error in personalized wellness recommendations: {str(e)}")
+        logger.exception("Error in personalized wellness recommendations: %s", e)
         return PersonalizedWellnessResponse(
             success=False,
             message=f"Failed to generate recommendations: {str(e)}",
             recommendations={}
         )
 
+# Asynchronous wellness jobs: the POST returns a job id straight away and a fixed
+# pool of workers claims queued jobs from Mongo, so slow generations never hold a
+# request open and jobs outlive the process that accepted them. A job whose worker
+# died is claimed again once its lease runs out.
+WELLNESS_JOB_TERMINAL_STATUSES = ("completed", "failed")
+
+_wellness_job_wakeup = asyncio.Event()  # set when a job is queued by this process
+_wellness_job_workers = []
+
+async def set_wellness_job_status(job_id: str, status: str, **fields):
+    await db.wellness_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"status": status, "updated_at": datetime.utcnow(), **fields}}
+    )
+
+async def claim_wellness_job() -> Optional[dict]:
+    """Take the oldest queued job, or a running one whose lease has expired"""
+    now = datetime.utcnow()
+    return await db.wellness_jobs.find_one_and_update(
+        {"$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_expires_at": {"$lt": now}}
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "started_at": now,
+                "updated_at": now,
+                "lease_expires_at": now + timedelta(seconds=WELLNESS_JOB_LEASE_SECONDS)
+            },
+            "$inc": {"attempts": 1}
+        },
+        projection={"_id": 0},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def run_wellness_job(job: dict) -> bool:
+    """Generate recommendations for a claimed job and record the outcome; False if it was shed"""
+    job_id = job["id"]
+    if job["attempts"] > WELLNESS_JOB_MAX_ATTEMPTS:
+        await set_wellness_job_status(job_id, "failed", error="Job was abandoned by its worker too many times")
+        return True
+    try:
+        request = PersonalizedWellnessRequest(**job["request"])
+        recommendation_id, _, cached = await get_or_generate_wellness_recommendations(request, limiter=wellness_limiter)
+        await set_wellness_job_status(job_id, "completed", recommendation_id=str(recommendation_id), cached=cached)
+    except OverloadedError:
+        # Synchronous requests have the generation slots; hand the job back without using up an attempt
+        await db.wellness_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "queued", "updated_at": datetime.utcnow()}, "$inc": {"attempts": -1}}
+        )
+        return False
+    except Exception as e:
+        logger.exception("Error in wellness job %s: %s", job_id, e)
+        await set_wellness_job_status(job_id, "failed", error=str(e))
+    return True
+
+async def wellness_job_worker():
+    while True:
+        _wellness_job_wakeup.clear()
+        try:
+            job = await claim_wellness_job()
+            if job is not None and await run_wellness_job(job):
+                continue
+        except Exception as e:
+            logger.exception("Error claiming wellness job: %s", e)
+        # Nothing to do (or shed): wait for a new job here, or re-check for ones queued elsewhere
+        try:
+            await asyncio.wait_for(_wellness_job_wakeup.wait(), WELLNESS_JOB_CLAIM_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+@api_router.on_event("startup")
+async def start_wellness_job_workers():
+    for _ in range(WELLNESS_JOB_CONCURRENCY):
+        _wellness_job_workers.append(asyncio.create_task(wellness_job_worker()))
+
+@api_router.on_event("shutdown")
+async def stop_wellness_job_workers():
+    for worker in _wellness_job_workers:
+        worker.cancel()
+    _wellness_job_workers.clear()
+
+async def get_wellness_job_state(job_id: str) -> dict:
+    """Job status, plus the stored recommendations once it has completed"""
+    job = await db.wellness_jobs.find_one({"id": job_id}, {"_id": 0, "request": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job["job_id"] = job.pop("id")
+    if job["status"] == "completed":
+        stored = await db.personalized_recommendations.find_one(
+            {"_id": ObjectId(job["recommendation_id"])},
+            {"_id": 0, "recommendations": 1}
+        )
+        job["recommendations"] = stored["recommendations"] if stored else {}
+    return job
+
+@api_router.post("/wellness/jobs", status_code=202)
+async def create_wellness_job(request: PersonalizedWellnessRequest, http_request: Request):
+    """Queue personalized wellness generation and return a job id to poll or subscribe to"""
+    await enforce_rate_limit("wellness_recommendations", http_request)
+    queued = await db.wellness_jobs.count_documents({"status": "queued"}, limit=WELLNESS_JOB_QUEUE_SIZE)
+    if queued >= WELLNESS_JOB_QUEUE_SIZE:
+        raise HTTPException(status_code=503, detail="Too many wellness jobs queued, please retry shortly")
+    
+    job_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    await db.wellness_jobs.insert_one({
+        "id": job_id,
+        "user_id": request.user_id,
+        "status": "queued",
+        "request": request.dict(),
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now
+    })
+    _wellness_job_wakeup.set()
+    
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/wellness/jobs/{job_id}",
+        "events_url": f"/api/wellness/jobs/{job_id}/events"
+    }
+
+@api_router.get("/wellness/jobs/{job_id}")
+async def get_wellness_job(job_id: str):
+    """Poll the status of a wellness generation job"""
+    return await get_wellness_job_state(job_id)
+
+@api_router.get("/wellness/jobs/{job_id}/events")
+async def stream_wellness_job_events(job_id: str):
+    """Server-sent events with status changes for a job, ending with its result"""
+    # Fail fast with a 404 before opening the stream
+    await get_wellness_job_state(job_id)
+    
+    async def event_stream():
+        last_status = None
+        deadline = time.monotonic() + WELLNESS_JOB_STREAM_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            job = await get_wellness_job_state(job_id)
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: {last_status}\ndata: {json.dumps(jsonable_encoder(job))}\n\n"
+            if last_status in WELLNESS_JOB_TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(WELLNESS_JOB_POLL_INTERVAL_SECONDS)
+        yield "event: timeout\ndata: {}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def parse_json_payload(ai_response: str):
+    """Strip markdown fences from a model response and parse it as JSON"""
+    with tracing.start_span("wellness.parse_json", **{"wellness.response_chars": len(ai_response)}):
+        # Clean the response to ensure it's valid JSON
+        ai_response = ai_response.strip().replace('```json', '').replace('```', '').strip()
+        return json.loads(ai_response)
+
+def validate_wellness_recommendations(category: str, category_recommendations) -> List[WellnessRecommendation]:
+    """Convert one category's parsed items into WellnessRecommendation objects"""
+    if not isinstance(category_recommendations, list) or not category_recommendations:
+        raise ValueError(f"expected a non-empty JSON array for {category}")
+    
+    recommendations = []
+    with tracing.start_span("wellness.validate", **{"wellness.category": category, "wellness.items": len(category_recommendations)}):
+        for rec_data in category_recommendations:
+            rec_data['category'] = category
+            recommendations.append(WellnessRecommendation(**rec_data))
+    return recommendations
+
 def get_fallback_recommendations(category: str, request: PersonalizedWellnessRequest) -> List[WellnessRecommendation]:
     """Provide fallback recommendations if AI generation fails"""
     fallback_data = {
@@ -1680,142 +2376,60 @@ class HabitProgress(BaseModel):
 
 # Mind and Soul API Endpoints
 
+# Fields each Mind & Soul endpoint reads back; _id stays on the server
+MOOD_ENTRY_PROJECTION = projection(
+    "id", "user_id", "date", "mood", "mood_label", "energy", "stress", "notes",
+    timestamp=iso_string("timestamp"),
+)
+MEDITATION_PROGRESS_PROJECTION = projection("duration_minutes", "completed", "date")
+HABIT_SUMMARY_PROJECTION = projection("habit_name", "completed", "date")
+STREAK_PROJECTION = projection("date")
+
+# Meditation library in the meditation_content collection (seeded by migrations);
+# query pages are cached as compressed payloads
+from config.settings import MEDITATION_CACHE_SIZE, MEDITATION_CACHE_TTL_SECONDS, MEDITATION_MAX_PAGE, MEDITATION_MAX_PAGE_SIZE
+from modules.meditation_library import MeditationLibrary
+
+meditation_library = MeditationLibrary(
+    db.meditation_content,
+    cache_ttl_seconds=MEDITATION_CACHE_TTL_SECONDS,
+    cache_size=MEDITATION_CACHE_SIZE,
+    max_page_size=MEDITATION_MAX_PAGE_SIZE
+)
+
+@api_router.on_event("startup")
+async def ensure_meditation_indexes():
+    await meditation_library.ensure_indexes()
+
 @api_router.get("/mind-soul/meditation-content")
-async def get_meditation_content():
-    """Get meditation and mindfulness content"""
-    meditation_content = [
-        {
-            "id": "guided-meditation-1",
-            "title": "Morning Mindfulness",
-            "description": "Start your day with clarity and focus through guided morning meditation",
-            "duration": "10 minutes",
-            "type": "guided_meditation",
-            "difficulty": "Beginner",
-            "benefits": ["Reduces stress", "Improves focus", "Increases energy"],
-            "instructions": [
-                "Find a comfortable seated position",
-                "Close your eyes gently",
-                "Focus on your breathing",
-                "Follow the guided instructions",
-                "End with gratitude practice"
-            ],
-            "youtube_video": "https://www.youtube.com/embed/inpok4MKVLM",
-            "category": "morning_routine",
-            "image_url": "meditation_morning.jpg"
-        },
-        {
-            "id": "breathing-exercise-1", 
-            "title": "4-7-8 Breathing Technique",
-            "description": "Powerful breathing exercise for anxiety relief and better sleep",
-            "duration": "5 minutes",
-            "type": "breathing_exercise",
-            "difficulty": "Beginner",
-            "benefits": ["Reduces anxiety", "Improves sleep", "Calms nervous system"],
-            "instructions": [
-                "Sit comfortably with back straight",
-                "Exhale completely through mouth",
-                "Inhale through nose for 4 counts",
-                "Hold breath for 7 counts", 
-                "Exhale through mouth for 8 counts",
-                "Repeat cycle 4 times"
-            ],
-            "youtube_video": "https://www.youtube.com/embed/YRPh_GaiL8s",
-            "category": "breathing",
-            "image_url": "breathing_exercise.jpg"
-        },
-        {
-            "id": "mindfulness-practice-1",
-            "title": "Body Scan Meditation",
-            "description": "Deep relaxation technique to release tension and increase awareness",
-            "duration": "15 minutes", 
-            "type": "mindfulness",
-            "difficulty": "Intermediate",
-            "benefits": ["Releases tension", "Increases body awareness", "Promotes relaxation"],
-            "instructions": [
-                "Lie down comfortably",
-                "Start with deep breathing",
-                "Focus on each body part systematically",
-                "Notice sensations without judgment",
-                "Complete with whole body awareness"
-            ],
-            "youtube_video": "https://www.youtube.com/embed/yCJ6fNd-jCE",
-            "category": "relaxation",
-            "image_url": "body_scan.jpg"
-        },
-        {
-            "id": "stress-relief-1",
-            "title": "Quick Stress Relief",
-            "description": "5-minute emergency stress relief technique for busy schedules",
-            "duration": "5 minutes",
-            "type": "stress_relief",
-            "difficulty": "Beginner", 
-            "benefits": ["Immediate stress relief", "Lowers cortisol", "Improves mood"],
-            "instructions": [
-                "Take 3 deep breaths",
-                "Tense and release each muscle group",
-                "Visualize a calm place",
-                "Practice gratitude",
-                "Return to normal breathing"
-            ],
-            "youtube_video": "https://www.youtube.com/embed/p8fjYPC-7bM",
-            "category": "stress_relief",
-            "image_url": "stress_relief.jpg"
-        },
-        {
-            "id": "sleep-meditation-1",
-            "title": "Sleep Preparation Meditation",
-            "description": "Gentle meditation to prepare mind and body for restful sleep",
-            "duration": "20 minutes",
-            "type": "sleep_meditation",
-            "difficulty": "Beginner",
-            "benefits": ["Improves sleep quality", "Calms racing thoughts", "Promotes deep rest"],
-            "instructions": [
-                "Lie down in bed comfortably",
-                "Progressive muscle relaxation",
-                "Guided visualization for peace",
-                "Focus on releasing the day",
-                "Drift into natural sleep"
-            ],
-            "youtube_video": "https://www.youtube.com/embed/j2YWMaDQ9LI",
-            "category": "sleep",
-            "image_url": "sleep_meditation.jpg"
-        },
-        {
-            "id": "focus-meditation-1",
-            "title": "Concentration Enhancement",
-            "description": "Meditation practice to improve focus and mental clarity",
-            "duration": "12 minutes",
-            "type": "focus_meditation", 
-            "difficulty": "Intermediate",
-            "benefits": ["Enhances concentration", "Improves productivity", "Strengthens mental clarity"],
-            "instructions": [
-                "Sit with spine straight",
-                "Focus on single point of attention",
-                "When mind wanders, gently return focus",
-                "Gradually extend concentration periods",
-                "End with appreciation for the practice"
-            ],
-            "youtube_video": "https://www.youtube.com/embed/oNkIzE_4WB8",
-            "category": "focus",
-            "image_url": "focus_meditation.jpg"
-        }
-    ]
-    
-    return {
-        "status": "success",
-        "content": meditation_content,
-        "total_count": len(meditation_content)
-    }
+async def get_meditation_content(
+    request: Request,
+    q: Optional[str] = None,
+    type: Optional[str] = None,
+    category: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    duration: Optional[int] = None,
+    max_duration: Optional[int] = None,
+    page: int = Query(1, ge=1, le=MEDITATION_MAX_PAGE),
+    page_size: int = Query(20, ge=1, le=MEDITATION_MAX_PAGE_SIZE)
+):
+    """Search meditation and mindfulness content by text, type, category, difficulty and duration (minutes)"""
+    try:
+        payload = await meditation_library.search(
+            q, type, category, difficulty, duration, max_duration, page, page_size
+        )
+    except Exception as e:
+        logger.exception("Error getting meditation content: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error getting meditation content: {str(e)}")
+    return payload.response(request.headers.get("accept-encoding"), request.headers.get("if-none-match"))
 
 @api_router.post("/mind-soul/mood-tracker")
 async def log_mood(mood_entry: MoodEntry):
     """Log daily mood entry"""
     try:
         # Create mood entry document with UUID instead of ObjectId
-        mood_doc = {
-            "id": str(uuid.uuid4()),
-            "user_id": mood_entry.user_id,
-            "date": mood_entry.date,
+        entry_id = str(uuid.uuid4())
+        mood_fields = {
             "mood": mood_entry.mood,
             "mood_label": mood_entry.mood_label,
             "energy": mood_entry.energy,
@@ -1824,35 +2438,28 @@ async def log_mood(mood_entry: MoodEntry):
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        # Check if entry for this date already exists
-        existing_entry = await db.mood_entries.find_one({
-            "user_id": mood_entry.user_id,
-            "date": mood_entry.date
-        })
+        # One round trip: update the entry for this date or create it, and read it back
+        mood_data = await db.mood_entries.find_one_and_update(
+            {"user_id": mood_entry.user_id, "date": mood_entry.date},
+            {"$set": mood_fields, "$setOnInsert": {"id": entry_id}},
+            projection=MOOD_ENTRY_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
         
-        if existing_entry:
-            # Update existing entry
-            await db.mood_entries.update_one(
-                {"user_id": mood_entry.user_id, "date": mood_entry.date},
-                {"$set": mood_doc}
-            )
-            message = "Mood entry updated successfully"
-        else:
-            # Create new entry
-            await db.mood_entries.insert_one(mood_doc)
+        if mood_data["id"] == entry_id:
             message = "Mood entry logged successfully"
-        
-        # Remove MongoDB _id from response
-        response_data = {k: v for k, v in mood_doc.items() if k != '_id'}
+        else:
+            message = "Mood entry updated successfully"
         
         return {
             "status": "success",
             "message": message,
-            "mood_data": response_data
+            "mood_data": mood_data
         }
         
     except Exception as e:
-        print(f"Error logging mood: {str(e)}")
+        logger.exception("Error logging mood: %s", e)
         raise HTTPException(status_code=500, detail=f"Error logging mood: {str(e)}")
 
 @api_router.get("/mind-soul/mood-history/{user_id}")
@@ -1860,19 +2467,11 @@ async def get_mood_history(user_id: str, days: int = 30):
     """Get mood history for a user"""
     try:
         # Get mood entries for the last N days
-        mood_entries = await db.mood_entries.find(
-            {"user_id": user_id}
+        # Timestamps come back as strings and without _id, ready to return as-is
+        clean_entries = await db.mood_entries.find(
+            {"user_id": user_id}, MOOD_ENTRY_PROJECTION
         ).sort("date", -1).limit(days).to_list(length=days)
         
-        # Remove MongoDB ObjectId and ensure datetime serialization
-        clean_entries = []
-        for entry in mood_entries:
-            clean_entry = {k: v for k, v in entry.items() if k != '_id'}
-            # Convert datetime to string if it exists
-            if 'timestamp' in clean_entry and hasattr(clean_entry['timestamp'], 'isoformat'):
-                clean_entry['timestamp'] = clean_entry['timestamp'].isoformat()
-            clean_entries.append(clean_entry)
-        
         # Calculate mood statistics
         if clean_entries:
             moods = [entry["mood"] for entry in clean_entries]
@@ -1897,7 +2496,7 @@ async def get_mood_history(user_id: str, days: int = 30):
         }
         
     except Exception as e:
-        print(f"Error getting mood history: {str(e)}")
+        logger.exception("Error getting mood history: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting mood history: {str(e)}")
 
 @api_router.post("/mind-soul/meditation-session")
@@ -1914,22 +2513,34 @@ async def log_meditation_session(session: MeditationSession):
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        await db.meditation_sessions.insert_one(session_doc)
-        
-        # Update user's meditation streak and total time
-        await update_meditation_progress(session.user_id, session.duration_minutes, session.completed)
+        # Retried submissions of the same session are stored (and counted) once, and
+        # every retry gets the session as it was first stored
+        session_key = {"user_id": session.user_id, "session_id": session.session_id}
+        try:
+            existing = await db.meditation_sessions.find_one_and_update(
+                session_key,
+                {"$setOnInsert": session_doc},
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # A concurrent retry inserted it first
+            existing = await db.meditation_sessions.find_one(session_key, {"_id": 0})
         
-        # Remove MongoDB _id from response
-        response_data = {k: v for k, v in session_doc.items() if k != '_id'}
+        # Update user's meditation streak and total time, only for the call that inserted
+        if existing is None:
+            await update_meditation_progress(session.user_id, session.duration_minutes, session.completed)
+        stored = existing or session_doc
         
         return {
             "status": "success",
             "message": "Meditation session logged successfully",
-            "session_data": response_data
+            "session_data": stored
         }
         
     except Exception as e:
-        print(f"Error logging meditation session: {str(e)}")
+        logger.exception("Error logging meditation session: %s", e)
         raise HTTPException(status_code=500, detail=f"Error logging session: {str(e)}")
 
 @api_router.get("/mind-soul/meditation-progress/{user_id}")
@@ -1937,7 +2548,9 @@ async def get_meditation_progress(user_id: str):
     """Get meditation progress for a user"""
     try:
         # Get total meditation time and sessions
-        sessions = await db.meditation_sessions.find({"user_id": user_id}).to_list(length=1000)
+        sessions = await db.meditation_sessions.find(
+            {"user_id": user_id}, MEDITATION_PROGRESS_PROJECTION
+        ).to_list(length=1000)
         
         total_sessions = len(sessions)
         total_minutes = sum(session["duration_minutes"] for session in sessions if session["completed"])
@@ -1963,7 +2576,7 @@ async def get_meditation_progress(user_id: str):
         }
         
     except Exception as e:
-        print(f"Error getting meditation progress: {str(e)}")
+        logger.exception("Error getting meditation progress: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting progress: {str(e)}")
 
 @api_router.post("/mind-soul/habit-tracker")
@@ -1979,32 +2592,21 @@ async def log_habit_progress(habit: HabitProgress):
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        # Check if entry exists for this date and habit
-        existing_habit = await db.habit_progress.find_one({
-            "user_id": habit.user_id,
-            "habit_name": habit.habit_name,
-            "date": habit.date
-        })
-        
-        if existing_habit:
-            await db.habit_progress.update_one(
-                {"user_id": habit.user_id, "habit_name": habit.habit_name, "date": habit.date},
-                {"$set": habit_doc}
-            )
-        else:
-            await db.habit_progress.insert_one(habit_doc)
-        
-        # Remove MongoDB _id from response
-        response_data = {k: v for k, v in habit_doc.items() if k != '_id'}
+        # Update the entry for this date and habit, or create it
+        await db.habit_progress.update_one(
+            {"user_id": habit.user_id, "habit_name": habit.habit_name, "date": habit.date},
+            {"$set": habit_doc},
+            upsert=True
+        )
         
         return {
             "status": "success",
             "message": "Habit progress logged successfully",
-            "habit_data": response_data
+            "habit_data": habit_doc
         }
         
     except Exception as e:
-        print(f"Error logging habit: {str(e)}")
+        logger.exception("Error logging habit: %s", e)
         raise HTTPException(status_code=500, detail=f"Error logging habit: {str(e)}")
 
 @api_router.get("/mind-soul/habits/{user_id}")
@@ -2012,7 +2614,7 @@ async def get_user_habits(user_id: str):
     """Get all habits for a user with current streaks"""
     try:
         # Get all habit entries for user
-        habits = await db.habit_progress.find({"user_id": user_id}).to_list(length=1000)
+        habits = await db.habit_progress.find({"user_id": user_id}, HABIT_SUMMARY_PROJECTION).to_list(length=1000)
         
         # Group by habit name and calculate streaks
         habit_summary = {}
@@ -2041,7 +2643,7 @@ async def get_user_habits(user_id: str):
         }
         
     except Exception as e:
-        print(f"Error getting habits: {str(e)}")
+        logger.exception("Error getting habits: %s", e)
         raise HTTPException(status_code=500, detail=f"Error getting habits: {str(e)}")
 
 # Helper functions
@@ -2057,7 +2659,7 @@ async def calculate_meditation_streak(user_id: str) -> int:
     """Calculate current meditation streak"""
     try:
         sessions = await db.meditation_sessions.find(
-            {"user_id": user_id, "completed": True}
+            {"user_id": user_id, "completed": True}, STREAK_PROJECTION
         ).sort("date", -1).to_list(length=100)
         
         if not sessions:
@@ -2078,14 +2680,14 @@ async def calculate_meditation_streak(user_id: str) -> int:
         return streak
         
     except Exception as e:
-        print(f"Error calculating streak: {str(e)}")
+        logger.exception("Error calculating streak: %s", e)
         return 0
 
 async def calculate_habit_streak(user_id: str, habit_name: str) -> int:
     """Calculate current habit streak"""
     try:
         habits = await db.habit_progress.find(
-            {"user_id": user_id, "habit_name": habit_name, "completed": True}
+            {"user_id": user_id, "habit_name": habit_name, "completed": True}, STREAK_PROJECTION
         ).sort("date", -1).to_list(length=100)
         
         if not habits:
@@ -2105,12 +2707,325 @@ async def calculate_habit_streak(user_id: str, habit_name: str) -> int:
         return streak
         
     except Exception as e:
-        print(f"Error calculating habit streak: {str(e)}")
+        logger.exception("Error calculating habit streak: %s", e)
         return 0
 
-# Include the router in the main app
+from config.settings import ADMIN_TOKEN
+
+async def explain_command(database_name: str, command: dict) -> dict:
+    return await client[database_name].command({"explain": command, "verbosity": "executionStats"})
+
+@api_router.on_event("startup")
+async def attach_slow_query_log():
+    slow_query_log.attach(asyncio.get_running_loop(), explain_command)
+
+def require_admin_token(request: Request):
+    token = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin access requires a valid X-Admin-Token")
+
+@api_router.get("/system/slow-queries")
+async def get_slow_queries(request: Request, limit: int = Query(20, ge=1, le=SLOW_QUERY_MAX_SHAPES)):
+    """Slowest query shapes by total time, with captured plans, plus the most recent slow commands"""
+    require_admin_token(request)
+    return jsonable_encoder({
+        "status": "success",
+        "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "top_shapes": slow_query_log.top(limit),
+        "recent": list(slow_query_log.recent)[-limit:]
+    })
+
+@api_router.get("/system/circuit-breakers")
+async def get_circuit_breakers(request: Request):
+    """Current state and latency percentiles of every LLM circuit breaker and route"""
+    require_admin_token(request)
+    return {
+        "status": "success",
+        "breakers": [breaker.snapshot() for breaker in all_breakers()],
+        "routes": llm_router.snapshot()  # per-category latency the router ranks providers on
+    }
+
+@api_router.get("/system/admission")
+async def get_admission_stats(request: Request):
+    """In-flight requests, queue depth and shed counts for the LLM-backed endpoints"""
+    require_admin_token(request)
+    return {
+        "status": "success",
+        "limiters": [limiter.snapshot() for limiter in all_limiters()]
+    }
+
+# Event loop blocking detector: reports the stack and route of any callback that
+# holds the loop past LOOP_BLOCK_THRESHOLD_SECONDS
+from config.settings import LOOP_BLOCK_THRESHOLD_SECONDS, LOOP_HEARTBEAT_INTERVAL_SECONDS
+from modules.loop_monitor import LoopMonitor, TaskRouteMiddleware
+
+def record_event_loop_lag(lag_seconds: float):
+    event_loop_lag.set(lag_seconds)
+    event_loop_lag_seconds.observe(lag_seconds)
+
+def report_blocked_event_loop(stalled_seconds: float, route: str, stack: str):
+    event_loop_blocked.inc(route=route)
+    logger.warning("Event loop blocked for %.3fs+ in %s", stalled_seconds, route, extra={"route": route, "stack": stack})
+
+loop_monitor = LoopMonitor(
+    threshold_seconds=LOOP_BLOCK_THRESHOLD_SECONDS,
+    interval_seconds=LOOP_HEARTBEAT_INTERVAL_SECONDS,
+    on_lag=record_event_loop_lag,
+    on_block=report_blocked_event_loop
+)
+
+# Added before the other middleware so it is innermost and shares the endpoint's task
+app.add_middleware(TaskRouteMiddleware, monitor=loop_monitor)
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+# Idempotency-Key support: mobile clients retry POSTs on flaky networks, so the
+# first response per key is stored and replayed instead of redoing the work
+from config.settings import IDEMPOTENCY_EXCLUDED_PREFIXES, IDEMPOTENCY_LEASE_SECONDS, IDEMPOTENCY_TTL_SECONDS
+from modules.idempotency import COMPLETED, IdempotencyStore, hash_body
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+idempotency_store = IdempotencyStore(db.idempotency_keys, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LEASE_SECONDS)
+
+def idempotency_scope(request: Request, body: bytes) -> str:
+    """Whose key this is: the user_id in the body, else the client IP, so clients can't collide"""
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict) and isinstance(payload.get("user_id"), str) and payload["user_id"]:
+        return f"user:{payload['user_id']}"
+    return f"ip:{client_ip(request)}"
+
+@app.middleware("http")
+async def idempotency_middleware(request: Request, call_next):
+    idempotency_key = request.headers.get("idempotency-key")
+    if (
+        request.method != "POST"
+        or not idempotency_key
+        or not request.url.path.startswith("/api/")
+        or request.url.path.startswith(IDEMPOTENCY_EXCLUDED_PREFIXES)
+    ):
+        return await call_next(request)
+    
+    if len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return JSONResponse({"detail": "Idempotency-Key is too long"}, status_code=400)
+    
+    request_body = await request.body()
+    key = f"{idempotency_scope(request, request_body)}:{request.url.path}:{idempotency_key}"
+    body_hash = hash_body(request_body)
+    record = await idempotency_store.begin(key, body_hash)
+    cache_requests.inc(cache="idempotency", result="miss" if record is None else "hit")
+    
+    if record is not None:
+        if record["body_hash"] != body_hash:
+            return JSONResponse({"detail": "Idempotency-Key was already used with a different request body"}, status_code=422)
+        if record["status"] != COMPLETED:
+            return JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still in progress"},
+                status_code=409,
+                headers={"Retry-After": "1"}
+            )
+        return Response(
+            content=record["body"],
+            status_code=record["status_code"],
+            headers={**record["headers"], "Idempotent-Replayed": "true"}
+        )
+    
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except Exception:
+        await idempotency_store.release(key)
+        raise
+    
+    # Server errors are not replayed so the client's retry gets a fresh attempt
+    if response.status_code >= 500:
+        await idempotency_store.release(key)
+    else:
+        await idempotency_store.complete(key, response.status_code, response.headers, body)
+    
+    return Response(content=body, status_code=response.status_code, headers=dict(response.headers))
+
+# Metrics endpoint and collection
+from modules.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+@app.middleware("http")
+async def request_metrics_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/api/grocery/carts/{cart_id}), not the raw path
+        route = request.scope.get("route")
+        http_request_seconds.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status
+        )
+
+@app.middleware("http")
+async def request_tracing_middleware(request: Request, call_next):
+    with tracing.start_span(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get("traceparent"),
+        **{"http.method": request.method, "http.target": request.url.path}
+    ) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            span.name = f"{request.method} {route.path}"
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.status_code", response.status_code)
+        if span.recording:
+            response.headers["X-Trace-Id"] = span.trace_id
+        return response
+
+@metrics_registry.on_collect
+def collect_resilience_metrics():
+    for limiter in all_limiters():
+        admission_in_flight.set(limiter.in_flight, limiter=limiter.name)
+        admission_queue_depth.set(limiter.queue_depth, limiter=limiter.name)
+        admission_shed.set_total(limiter.shed, limiter=limiter.name)
+    for breaker in all_breakers():
+        circuit_breaker_open.set(0 if breaker.state == "closed" else 1, breaker=breaker.name)
+        circuit_breaker_p95_seconds.set(breaker.percentile(95), breaker=breaker.name)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.on_event("shutdown")
+async def flush_traces():
+    tracing.shutdown()
+
+# On-demand sampling profiler: a request is profiled when it carries the
+# privileged X-Profile-Token header or is picked by PROFILER_SAMPLE_RATE
+from config.settings import (
+    PROFILER_DIR,
+    PROFILER_ENABLED,
+    PROFILER_INTERVAL_SECONDS,
+    PROFILER_MAX_PROFILES,
+    PROFILER_SAMPLE_RATE,
+    PROFILER_TOKEN,
+)
+from modules.profiler import ProfileStore, SamplingProfiler
+
+profile_store = ProfileStore(PROFILER_DIR, PROFILER_MAX_PROFILES)
+_profiler_busy = False  # one profile at a time keeps the overhead bounded
+
+def has_profiler_token(request: Request) -> bool:
+    token = request.headers.get("x-profile-token", "")
+    # Compared as bytes: compare_digest raises TypeError on non-ASCII str
+    return bool(PROFILER_TOKEN) and hmac.compare_digest(token.encode(), PROFILER_TOKEN.encode())
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    global _profiler_busy
+    if (
+        not PROFILER_ENABLED
+        or _profiler_busy
+        or request.url.path.startswith("/api/system/profiles")
+        or not (has_profiler_token(request) or random.random() < PROFILER_SAMPLE_RATE)
+    ):
+        return await call_next(request)
+    
+    _profiler_busy = True
+    profiler = SamplingProfiler(threading.get_ident(), PROFILER_INTERVAL_SECONDS).start()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        stacks = profiler.stop()
+        _profiler_busy = False
+        route = request.scope.get("route")
+        try:
+            await asyncio.to_thread(
+                profile_store.save,
+                stacks,
+                method=request.method,
+                route=route.path if route is not None else request.url.path,
+                path=request.url.path,
+                status=status,
+                latency_ms=latency_ms,
+                interval_seconds=PROFILER_INTERVAL_SECONDS
+            )
+        except Exception as e:
+            logger.exception("Error saving profile: %s", e)
+
+def require_profiler_token(request: Request):
+    if not has_profiler_token(request):
+        raise HTTPException(status_code=403, detail="Profiler access requires a valid X-Profile-Token")
+
+@api_router.get("/system/profiles", include_in_schema=False)
+async def list_profiles(request: Request, limit: int = 50):
+    """Most recent request profiles with route, status and latency"""
+    require_profiler_token(request)
+    return {
+        "status": "success",
+        "profiles": await asyncio.to_thread(profile_store.recent, min(max(limit, 1), PROFILER_MAX_PROFILES))
+    }
+
+@api_router.get("/system/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str, request: Request):
+    """Collapsed stacks for one profile, ready for flamegraph.pl or speedscope"""
+    require_profiler_token(request)
+    collapsed = await asyncio.to_thread(profile_store.read, profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=collapsed, media_type="text/plain")
+
+# Include the router in the main app, now that every /api route is registered on it
 app.include_router(api_router)
 
+# Response compression for everything not already precompressed (chat answers,
+# wellness plans, cart listings); inside request_id so access logs include it
+from config.settings import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, COMPRESSION_MIN_SIZE
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+)
+
+# Request ids: taken from X-Request-ID or generated, attached to every log record
+# and echoed back. Registered last so it wraps the other middleware.
+access_logger = logging.getLogger("access")
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id[:128])
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id_var.get()
+        # INFO, so subject to LOG_INFO_SAMPLE_RATE on busy workers
+        access_logger.info(
+            "%s %s %s",
+            request.method, request.url.path, response.status_code,
+            extra={"status": response.status_code, "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+        )
+        return response
+    finally:
+        request_id_var.reset(token)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -2119,13 +3034,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+
+@app.on_event("shutdown")
+async def stop_log_listener():
+    log_listener.stop()
\ No newline at end of file